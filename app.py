@@ -2,10 +2,18 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from py3dbp import Packer, Bin, Item
+import time
 import plotly.graph_objects as go
 import plotly.express as px
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from styles import get_styles
+from solver_service import SolverService, SolverError
+from replenishment import generate_pick_events, load_pick_events, simulate_replenishment
+from packing import (
+    RANKING_METRICS, PACKING_ENGINES, get_orientation_description, calculate_pallet_position,
+    INTERACTIVE_TIME_BUDGET_MS, BATCH_TIME_BUDGET_MS, analyze_packing_layers, prepare_pallet_space,
+    solve_problem, name_result, iter_solve_skus, pack_skus_max, rank_configurations
+)
 
 # === CONFIGURATION ===
 st.set_page_config(page_title="SmartPack - Athens Distribution Center", page_icon="📦", layout="wide")
@@ -72,26 +80,6 @@ PALLET_COLOR = "#8B4513"
 FLOOR_COLOR = "#708090"
 RACK_COLOR = "#2F4F4F"
 
-# Function to determine orientation description
-def get_orientation_description(original_dims, current_dims):
-    orig_w, orig_d, orig_h = original_dims[:3]
-    curr_w, curr_d, curr_h = current_dims
-    
-    if (orig_w, orig_d, orig_h) == (curr_w, curr_d, curr_h):
-        return "Standard (W×D×H)"
-    elif (orig_d, orig_w, orig_h) == (curr_w, curr_d, curr_h):
-        return "Rotated 90° (D×W×H)"
-    elif (orig_w, orig_h, orig_d) == (curr_w, curr_d, curr_h):
-        return "On Side (W×H×D)"
-    elif (orig_d, orig_h, orig_w) == (curr_w, curr_d, curr_h):
-        return "On Side (D×H×W)"
-    elif (orig_h, orig_w, orig_d) == (curr_w, curr_d, curr_h):
-        return "Standing (H×W×D)"
-    elif (orig_h, orig_d, orig_w) == (curr_w, curr_d, curr_h):
-        return "Standing (H×D×W)"
-    else:
-        return "Custom Orientation"
-
 # Function to create 3D box mesh for Plotly
 def create_box_mesh(x, y, z, width, depth, height, color, name="", opacity=0.8):
     """Create a 3D box mesh for Plotly visualization"""
@@ -116,7 +104,6 @@ def create_box_mesh(x, y, z, width, depth, height, color, name="", opacity=0.8):
 
 # Function to create individual SKU inputs
 def create_sku_inputs():
-    st.sidebar.header("SKU Configuration")
     num_skus = st.sidebar.number_input("Number of SKU types", min_value=1, max_value=10, value=1)
     
     skus = []
@@ -144,181 +131,113 @@ def create_sku_inputs():
     
     return pd.DataFrame(skus) if skus else None
 
-# Function to calculate pallet position (95% of location, centered)
-def calculate_pallet_position(loc_w, loc_d, pallet_w, pallet_d):
-    scale_factor = 0.95
-    available_w = loc_w * scale_factor
-    available_d = loc_d * scale_factor
-    
-    final_pallet_w = min(pallet_w, available_w)
-    final_pallet_d = min(pallet_d, available_d)
-    
-    offset_x = (loc_w - final_pallet_w) / 2
-    offset_y = (loc_d - final_pallet_d) / 2
-    
-    return final_pallet_w, final_pallet_d, offset_x, offset_y
+# Columns expected in a bulk SKU upload (weight is optional)
+SKU_COLUMNS = ['name', 'width', 'depth', 'height', 'weight']
+SKU_TEMPLATE_CSV = "name,width,depth,height,weight\nSKU_1,10,10,10,5\nSKU_2,12,8,6,2.5\n"
 
-# Enhanced packing function with better orientation support
-def find_max_quantity_with_orientations(sku_dims, pallet_dims, available_height, max_weight):
-    pallet_w, pallet_d = pallet_dims[0], pallet_dims[1]
-    sku_w, sku_d, sku_h, sku_weight = sku_dims
-    
-    # Try all 6 main orientations
-    orientations = [
-        (sku_w, sku_d, sku_h),  # Original
-        (sku_d, sku_w, sku_h),  # Rotated 90°
-        (sku_w, sku_h, sku_d),  # On side (width-height base)
-        (sku_d, sku_h, sku_w),  # On side (depth-height base)
-        (sku_h, sku_w, sku_d),  # Standing (height-width base)
-        (sku_h, sku_d, sku_w)   # Standing (height-depth base)
-    ]
-    
-    best_result = None
-    best_quantity = 0
-    
-    for orientation in orientations:
-        w, d, h = orientation
-        # Quick feasibility check
-        if w <= pallet_w and d <= pallet_d and h <= available_height:
-            # Estimate maximum possible
-            layers_possible = int(available_height / h)
-            items_per_layer = int((pallet_w / w)) * int((pallet_d / d))
-            max_estimate = min(layers_possible * items_per_layer, int(max_weight / sku_weight), 300)
-            
-            if max_estimate > 0:
-                # Binary search for this orientation
-                quantity = binary_search_quantity((w, d, h, sku_weight), pallet_dims, available_height, max_weight, max_estimate)
-                if quantity > best_quantity:
-                    best_quantity = quantity
-                    best_result = {
-                        'quantity': quantity,
-                        'orientation': orientation,
-                        'original_dims': sku_dims
-                    }
-    
-    return best_result
+# Function to validate an uploaded SKU table column-wise; returns (valid SKUs, rejected rows with reasons)
+def validate_sku_table(table):
+    table = table.rename(columns=lambda column: str(column).strip().lower())
+    missing = [column for column in SKU_COLUMNS[:4] if column not in table.columns]
+    if missing:
+        return None, pd.DataFrame({'Row': [None], 'Name': [None], 'Problem': [f"Missing columns: {', '.join(missing)}"]})
 
-def binary_search_quantity(sku_dims, pallet_dims, available_height, max_weight, max_estimate):
-    low, high = 1, max_estimate
-    best_quantity = 0
-    
-    while low <= high:
-        mid = (low + high) // 2
-        if test_packing_orientation(sku_dims, mid, pallet_dims, available_height, max_weight):
-            best_quantity = mid
-            low = mid + 1
-        else:
-            high = mid - 1
-    
-    return best_quantity
+    skus = pd.DataFrame({'name': table['name'].astype('string').str.strip()})
+    for column in ['width', 'depth', 'height']:
+        skus[column] = pd.to_numeric(table[column], errors='coerce')
+    skus['weight'] = pd.to_numeric(table['weight'], errors='coerce') if 'weight' in table.columns else np.nan
 
-def test_packing_orientation(sku_dims, quantity, pallet_dims, available_height, max_weight):
-    packer = Packer()
-    sku_w, sku_d, sku_h, sku_weight = sku_dims
-    pallet_w, pallet_d = pallet_dims[0], pallet_dims[1]
-    
-    bin = Bin("TestBin", pallet_w, pallet_d, available_height, max_weight)
-    packer.add_bin(bin)
-    
-    for i in range(quantity):
-        item = Item(f"test_{i}", sku_w, sku_d, sku_h, sku_weight)
-        packer.add_item(item)
-    
-    packer.pack(bigger_first=True, distribute_items=True)
-    return len(packer.bins[0].items) == quantity if packer.bins else False
+    checks = pd.DataFrame({
+        'missing name': skus['name'].isna() | (skus['name'] == ""),
+        'duplicate name': skus['name'].duplicated() & skus['name'].notna(),
+        'dimensions must be positive numbers': ~(skus[['width', 'depth', 'height']] > 0).all(axis=1),
+        'negative weight': skus['weight'] < 0,
+    })
+    rejected = checks.any(axis=1)
 
-# Enhanced function to analyze layers and orientations
-def analyze_packing_layers(packed_items, pallet_h, original_dims):
-    if not packed_items:
-        return []
-    
-    # Group items by Z position (layers)
-    layers = {}
-    for item in packed_items:
-        z_pos = float(item.position[2])
-        layer_key = round(z_pos, 1)  # Round to nearest 0.1 inch
-        
-        if layer_key not in layers:
-            layers[layer_key] = []
-        layers[layer_key].append(item)
-    
-    # Analyze each layer
-    layer_analysis = []
-    for z_pos in sorted(layers.keys()):
-        items_in_layer = layers[z_pos]
-        layer_height = pallet_h + z_pos
-        
-        # Get orientation for items in this layer
-        if items_in_layer:
-            item = items_in_layer[0]  # All items in layer should have same orientation
-            w, d, h = [float(dim) for dim in item.get_dimension()]
-            orientation_desc = get_orientation_description(original_dims, (w, d, h))
-            
-            layer_analysis.append({
-                'layer_number': len(layer_analysis) + 1,
-                'z_position': layer_height,
-                'item_count': len(items_in_layer),
-                'dimensions': f"{w:.1f}×{d:.1f}×{h:.1f}",
-                'orientation': orientation_desc,
-                'arrangement': f"{len(items_in_layer)} items in {orientation_desc.lower()} position"
-            })
-    
-    return layer_analysis
+    # Same default as manual entry: missing or zero weight counts as 1 lb
+    skus['weight'] = skus['weight'].where(skus['weight'] > 0, 1.0)
 
-# Main packing function
-def pack_skus_max(skus, loc_dims, loc_max_weight, pallet_dims):
-    loc_w, loc_d, loc_h = loc_dims
-    
-    actual_pallet_w, actual_pallet_d, offset_x, offset_y = calculate_pallet_position(
-        loc_w, loc_d, pallet_dims[0], pallet_dims[1]
+    errors = pd.DataFrame({
+        'Row': checks.index[rejected] + 2,  # CSV line number (header is line 1)
+        'Name': skus['name'][rejected],
+        'Problem': checks[rejected].dot(checks.columns + "; ").str.rstrip("; ")
+    })
+    return skus[~rejected].reset_index(drop=True), errors.reset_index(drop=True)
+
+# Function to create the bulk SKU upload and editor
+def create_bulk_sku_inputs():
+    uploaded = st.sidebar.file_uploader("SKU CSV (name, width, depth, height, weight)", type="csv")
+    st.sidebar.download_button("Download CSV Template", SKU_TEMPLATE_CSV, "sku_template.csv", "text/csv")
+    if uploaded is None:
+        return None
+
+    try:
+        # Read every column as text: SKU codes like 001 or 1e3 must stay as written, and
+        # validate_sku_table converts the dimension columns itself (headers aren't normalized yet)
+        table = pd.read_csv(uploaded, dtype=str)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as error:
+        st.sidebar.error(f"Could not read {uploaded.name}: {error}")
+        return None
+
+    skus, errors = validate_sku_table(table)
+    if skus is None:
+        st.sidebar.error(errors['Problem'][0])
+        return None
+
+    with st.expander(f"Uploaded SKUs - {len(skus)} valid, {len(errors)} rejected", expanded=len(errors) > 0):
+        edited = st.data_editor(skus, num_rows="dynamic", hide_index=True, use_container_width=True,
+                                key=f"bulk_skus_{uploaded.name}_{uploaded.size}")
+        if len(errors):
+            st.warning("These rows were skipped:")
+            st.dataframe(errors, hide_index=True, use_container_width=True)
+
+    # Edits are validated again; rows broken while editing are skipped
+    skus, _ = validate_sku_table(edited)
+    return skus
+# Schneider Electric green shades for the packed units
+GREEN_PALETTE = ["#00954A", "#007C3E", "#4CAF50", "#66BB6A", "#81C784"]
+
+# Above this many units each layer is drawn as one block instead of unit by unit
+MAX_RENDERED_UNITS = 1000
+
+# Corner offsets and triangles of a unit box, matching create_box_mesh
+BOX_CORNERS = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0], [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]])
+BOX_TRIANGLES = np.array([[0, 1, 2], [0, 2, 3], [0, 4, 5], [7, 6, 2], [7, 4, 5], [7, 6, 2],
+                          [4, 5, 6], [4, 6, 5], [1, 5, 4], [1, 2, 6], [2, 6, 7], [2, 3, 7]])
+
+# Function to draw many boxes (rows of x, y, z, w, d, h) as a single Plotly mesh
+def create_boxes_mesh(boxes, color, name="", opacity=0.8):
+    # float32 vertices and int32 indices keep the binary-encoded figure payload small
+    vertices = (boxes[:, None, :3] + BOX_CORNERS[None, :, :] * boxes[:, None, 3:]).reshape(-1, 3).astype(np.float32)
+    faces = (BOX_TRIANGLES[None, :, :] + 8 * np.arange(len(boxes))[:, None, None]).reshape(-1, 3).astype(np.int32)
+    return go.Mesh3d(
+        x=vertices[:, 0], y=vertices[:, 1], z=vertices[:, 2],
+        i=faces[:, 0], j=faces[:, 1], k=faces[:, 2],
+        color=color,
+        opacity=opacity,
+        name=name,
+        showscale=False
     )
-    
-    available_height = loc_h - pallet_dims[2]
-    available_weight = loc_max_weight - pallet_dims[3]
-    
-    updated_pallet_dims = (actual_pallet_w, actual_pallet_d, pallet_dims[2], pallet_dims[3])
-    
-    results = []
-    for _, sku in skus.iterrows():
-        sku_dims = (sku['width'], sku['depth'], sku['height'], sku['weight'])
-        best_result = find_max_quantity_with_orientations(sku_dims, updated_pallet_dims, available_height, available_weight)
-        
-        if best_result and best_result['quantity'] > 0:
-            # Final packing with best orientation
-            packer = Packer()
-            bin = Bin("PalletBin", actual_pallet_w, actual_pallet_d, available_height, available_weight)
-            packer.add_bin(bin)
-            
-            w, d, h = best_result['orientation']
-            for i in range(best_result['quantity']):
-                item = Item(f"{sku['name']}_{i}", w, d, h, sku['weight'])
-                packer.add_item(item)
-            
-            packer.pack(bigger_first=True, distribute_items=True)
-            
-            # Analyze layers with enhanced descriptions
-            layer_analysis = analyze_packing_layers(packer.bins[0].items, pallet_dims[2], best_result['original_dims'])
-            
-            results.append({
-                'sku_name': sku['name'],
-                'max_quantity': best_result['quantity'],
-                'best_orientation': best_result['orientation'],
-                'original_dims': best_result['original_dims'],
-                'packed_bin': packer.bins[0] if packer.bins else None,
-                'pallet_dims': updated_pallet_dims,
-                'pallet_offset': (offset_x, offset_y),
-                'layer_analysis': layer_analysis
-            })
-    
-    return results
+
+# Function to collapse placements into one bounding block per layer (units grouped by z)
+def layer_blocks(placements):
+    layer_keys = np.round(placements[:, 2], 1)
+    blocks = []
+    for z in np.unique(layer_keys):
+        layer = placements[layer_keys == z]
+        x0, y0 = layer[:, 0].min(), layer[:, 1].min()
+        x1, y1 = (layer[:, 0] + layer[:, 3]).max(), (layer[:, 1] + layer[:, 4]).max()
+        blocks.append((x0, y0, float(z), x1 - x0, y1 - y0, layer[:, 5].max()))
+    return np.array(blocks)
 
 # Plotly 3D Visualization function
 def create_plotly_visualization(result, loc_w, loc_d, loc_h, loc_choice, pallet_choice, view_type="aisle"):
     """Create 3D visualization using Plotly"""
     fig = go.Figure()
     
-    pallet_w, pallet_d, pallet_h, pallet_weight = result['pallet_dims']
-    offset_x, offset_y = result['pallet_offset']
+    pallet_w, pallet_d, pallet_h, pallet_weight = result.pallet_dims
+    offset_x, offset_y = result.pallet_offset
     
     # Add warehouse context for aisle view
     if view_type == "aisle":
@@ -351,35 +270,22 @@ def create_plotly_visualization(result, loc_w, loc_d, loc_h, loc_choice, pallet_
     )
     fig.add_trace(pallet_mesh)
     
-    # Add packed items with different colors for different layers
-    packed_bin = result['packed_bin']
-    if packed_bin and packed_bin.items:
-        # Schneider Electric green color palette
-        green_palette = ["#00954A", "#007C3E", "#4CAF50", "#66BB6A", "#81C784"]
-        
-        for i, item in enumerate(packed_bin.items):
-            x, y, z = [float(p) for p in item.position]
-            w, d, h = [float(dim) for dim in item.get_dimension()]
-            
-            # Adjust position to account for pallet offset
-            box_x = offset_x + x
-            box_y = offset_y + y
-            box_z = pallet_h + z
-            
-            # Use different shades of green for different layers
-            layer_index = int(z / 10)  # Rough layer grouping
-            color = green_palette[layer_index % len(green_palette)]
-            
-            box_mesh = create_box_mesh(
-                box_x, box_y, box_z,
-                w, d, h,
-                color, f"SKU Item {i+1}", 0.9
-            )
-            fig.add_trace(box_mesh)
-    
+    # Add packed items, one batched mesh per shade of green (shade follows the layer height)
+    placements = result.placements.astype(np.float64)
+    title_note = ""
+    if len(placements) > MAX_RENDERED_UNITS:
+        placements = layer_blocks(placements)
+        title_note = f" ({result.max_quantity:,} units, layers shown as blocks)"
+    if len(placements):
+        boxes = placements + [offset_x, offset_y, pallet_h, 0, 0, 0]
+        layer_index = (placements[:, 2] / 10).astype(int) % len(GREEN_PALETTE)  # Rough layer grouping
+        for shade, color in enumerate(GREEN_PALETTE):
+            if (layer_index == shade).any():
+                fig.add_trace(create_boxes_mesh(boxes[layer_index == shade], color, "SKU Items", 0.9))
+
     # Update layout
     fig.update_layout(
-        title=f"3D Warehouse Visualization - {view_type.title()} View",
+        title=f"3D Warehouse Visualization - {view_type.title()} View{title_note}",
         scene=dict(
             xaxis_title="Width (inches)",
             yaxis_title="Depth (inches)",
@@ -402,34 +308,39 @@ def create_plotly_visualization(result, loc_w, loc_d, loc_h, loc_choice, pallet_
     
     return fig
 
-# === UI ===
-st.caption("Advanced 3D optimization with intelligent orientation analysis and layer-by-layer planning")
-
-skus = create_sku_inputs()
-
-st.sidebar.header("Location & Pallet")
-loc_choice = st.sidebar.selectbox("Location Type", LOCATION_TYPE_LIST)
-loc_w, loc_d, loc_h, loc_maxw = LOCATION_TYPES[loc_choice]
+# Process-wide solver service shared by every session on this server
+@st.cache_resource
+def get_solver_service():
+    return SolverService()
 
-pallet_choice = st.sidebar.selectbox("Pallet Type", PALLET_TYPE_LIST)
-pallet_dims = PALLET_TYPES[pallet_choice]
+# Function to get an executor that submits work to the shared solver on behalf of this session
+def get_session_executor():
+    ctx = get_script_run_ctx()
+    return get_solver_service().session_executor(ctx.session_id if ctx else "local")
 
-if st.button("Optimize Storage Configuration"):
-    if skus is None or skus.empty:
-        st.error("Please enter at least one SKU.")
-        st.stop()
+# Function to render the shared solver metrics in the sidebar
+def render_solver_metrics():
+    metrics = get_solver_service().metrics()
+    with st.sidebar.expander("Solver Service"):
+        col1, col2 = st.columns(2)
+        col1.metric("Queue Wait p50", f"{metrics['queue_wait_ms_p50']:.0f} ms")
+        col2.metric("Queue Wait p95", f"{metrics['queue_wait_ms_p95']:.0f} ms")
+        col1.metric("Service Time p50", f"{metrics['service_time_ms_p50']:.0f} ms")
+        col2.metric("Service Time p95", f"{metrics['service_time_ms_p95']:.0f} ms")
+        st.caption(
+            f"In flight: {metrics['in_flight']} | Completed: {metrics['completed']} | "
+            f"Coalesced: {metrics['coalesced']} | Rejected: {metrics['rejected']} | "
+            f"Failed: {metrics['failed']} | Pool restarts: {metrics['pool_restarts']}"
+        )
 
+# Function to render the location and pallet summary cards
+def render_configuration_summary(loc_choice, pallet_choice):
+    loc_w, loc_d, loc_h, loc_maxw = LOCATION_TYPES[loc_choice]
+    pallet_dims = PALLET_TYPES[pallet_choice]
     actual_pallet_w, actual_pallet_d, offset_x, offset_y = calculate_pallet_position(
         loc_w, loc_d, pallet_dims[0], pallet_dims[1]
     )
 
-    results = pack_skus_max(skus, (loc_w, loc_d, loc_h), loc_maxw, pallet_dims)
-    
-    if not results:
-        st.error("No items could be packed. Check SKU dimensions and location size.")
-        st.stop()
-
-    st.subheader("Storage Configuration Summary")
     col1, col2 = st.columns(2)
     with col1:
         st.markdown(f"""
@@ -450,64 +361,449 @@ if st.button("Optimize Storage Configuration"):
         </div>
         """, unsafe_allow_html=True)
 
-    st.subheader("Optimization Results")
-    
-    for result in results:
-        sku_name = result['sku_name']
-        max_qty = result['max_quantity']
-        best_orientation = result['best_orientation']
-        original_dims = result['original_dims']
-        packed_bin = result['packed_bin']
-        layer_analysis = result['layer_analysis']
+# Function to calculate the share of the pallet's usable cube filled by the packed units
+def calculate_utilization(result, loc_choice):
+    loc_h = LOCATION_TYPES[loc_choice][2]
+    pallet_w, pallet_d, pallet_h = result.pallet_dims[:3]
+    pallet_vol = pallet_w * pallet_d * (loc_h - pallet_h)
+    return result.item_volume / pallet_vol if pallet_vol > 0 else 0
+
+# Function to build the sortable bulk summary, one row per SKU (None entries are still computing)
+def build_bulk_summary(entries):
+    rows = []
+    for entry in entries:
+        if entry is None:
+            continue
+        result = entry['result']
+        rows.append({
+            'SKU': entry['sku_name'],
+            'Location': entry['location'],
+            'Pallet': entry['pallet'],
+            'Units': result.max_quantity if result else 0,
+            'Space Utilization': 100 * calculate_utilization(result, entry['location']) if result else 0.0,
+            'Total Weight (lbs)': result.total_weight if result else 0.0,
+            'Gap': 100 * result.gap if result else None,
+            'Status': ("Optimal" if result.gap == 0 else "Complete" if result.complete else "Time budget reached")
+                      if result else "Does not fit"
+        })
+    return pd.DataFrame(rows, columns=['SKU', 'Location', 'Pallet', 'Units', 'Space Utilization',
+                                       'Total Weight (lbs)', 'Gap', 'Status'])
+
+# Function to show the bulk summary table
+def render_bulk_summary(container, entries):
+    container.dataframe(
+        build_bulk_summary(entries), hide_index=True, use_container_width=True,
+        column_config={
+            'Space Utilization': st.column_config.NumberColumn(format="%.1f%%"),
+            'Total Weight (lbs)': st.column_config.NumberColumn(format="%.1f"),
+            'Gap': st.column_config.NumberColumn(format="%.1f%%"),
+        }
+    )
+
+# Function to render the packing result, layer cards and 3D views of one SKU
+def render_sku_result(result, loc_choice, pallet_choice):
+    loc_w, loc_d, loc_h, loc_maxw = LOCATION_TYPES[loc_choice]
+    pallet_dims = PALLET_TYPES[pallet_choice]
+    actual_pallet_w, actual_pallet_d = result.pallet_dims[:2]
+
+    sku_name = result.sku_name
+    max_qty = result.max_quantity
+    best_orientation = result.best_orientation
+    original_dims = result.original_dims
+    
+    if len(result.placements):
+        layer_analysis = analyze_packing_layers(result.placements, pallet_dims[2], original_dims)
+        total_weight = result.total_weight
+        utilization = calculate_utilization(result, loc_choice)
+        
+        st.success(f"**{sku_name}:** Maximum **{max_qty} units** | Space Utilization: **{utilization:.1%}** | Total Weight: **{total_weight:.1f} lbs**")
+        st.caption(
+            f"Proven upper bound: {result.upper_bound} units | Optimality gap: {result.gap:.1%}"
+            + ("" if result.complete else " | Time budget reached, search incomplete")
+        )
+        
+        # Orientation info (layered stacks may turn the SKU differently from layer to layer)
+        orientation_desc = get_orientation_description(original_dims, best_orientation)
+        orientation_dims = f"{best_orientation[0]:.1f}×{best_orientation[1]:.1f}×{best_orientation[2]:.1f}"
+        layer_orientations = pd.Series([layer['orientation'] for layer in layer_analysis]).value_counts(sort=False)
+        if len(layer_orientations) > 1:
+            stack = ", ".join(f"{count} × {orientation}" for orientation, count in layer_orientations.items())
+            st.info(f"**Base Layer Orientation:** {orientation_desc} ({orientation_dims}) | **Layer Stack:** {stack}")
+        else:
+            st.info(f"**Optimal Orientation:** {orientation_desc} ({orientation_dims})")
+        
+        # Enhanced Layer-by-layer breakdown
+        st.subheader(f"Detailed Layer Analysis - {sku_name}")
+        
+        for layer in layer_analysis:
+            st.markdown(f"""
+            <div class="layer-card fade-in">
+                <h4>Layer {layer['layer_number']} (Height: {layer['z_position']:.1f}")</h4>
+                <p><strong>Items:</strong> {layer['item_count']} units</p>
+                <p><strong>Dimensions:</strong> {layer['dimensions']} inches</p>
+                <p><strong>Orientation:</strong> <span class="orientation-badge">{layer['orientation']}</span></p>
+                <p><strong>Arrangement:</strong> {layer['arrangement']}</p>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        # 3D Visualizations using Plotly
+        st.subheader(f"3D Visualization - {sku_name}")
+        col1, col2, col3 = st.columns(3)
         
-        if packed_bin and packed_bin.items:
-            total_weight = sum(float(i.weight) for i in packed_bin.items) + pallet_dims[3]
-            item_vol = sum(float(i.width) * float(i.depth) * float(i.height) for i in packed_bin.items)
-            pallet_vol = actual_pallet_w * actual_pallet_d * (loc_h - pallet_dims[2])
-            utilization = item_vol / pallet_vol if pallet_vol > 0 else 0
-            
-            st.success(f"**{sku_name}:** Maximum **{max_qty} units** | Space Utilization: **{utilization:.1%}** | Total Weight: **{total_weight:.1f} lbs**")
-            
-            # Orientation info
-            orientation_desc = get_orientation_description(original_dims, best_orientation)
-            st.info(f"**Optimal Orientation:** {orientation_desc} ({best_orientation[0]:.1f}×{best_orientation[1]:.1f}×{best_orientation[2]:.1f})")
-            
-            # Enhanced Layer-by-layer breakdown
-            st.subheader(f"Detailed Layer Analysis - {sku_name}")
-            
-            for layer in layer_analysis:
-                st.markdown(f"""
-                <div class="layer-card fade-in">
-                    <h4>Layer {layer['layer_number']} (Height: {layer['z_position']:.1f}")</h4>
-                    <p><strong>Items:</strong> {layer['item_count']} units</p>
-                    <p><strong>Dimensions:</strong> {layer['dimensions']} inches</p>
-                    <p><strong>Orientation:</strong> <span class="orientation-badge">{layer['orientation']}</span></p>
-                    <p><strong>Arrangement:</strong> {layer['arrangement']}</p>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            # 3D Visualizations using Plotly
-            st.subheader(f"3D Visualization - {sku_name}")
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                st.markdown('<div class="viz-container"><h4>Aisle View</h4></div>', unsafe_allow_html=True)
-                fig_aisle = create_plotly_visualization(result, loc_w, loc_d, loc_h, loc_choice, pallet_choice, "aisle")
-                st.plotly_chart(fig_aisle, use_container_width=True)
-
-            with col2:
-                st.markdown('<div class="viz-container"><h4>Top View</h4></div>', unsafe_allow_html=True)
-                fig_top = create_plotly_visualization(result, loc_w, loc_d, loc_h, loc_choice, pallet_choice, "top")
-                st.plotly_chart(fig_top, use_container_width=True)
-
-            with col3:
-                st.markdown('<div class="viz-container"><h4>Side View</h4></div>', unsafe_allow_html=True)
-                fig_side = create_plotly_visualization(result, loc_w, loc_d, loc_h, loc_choice, pallet_choice, "side")
-                st.plotly_chart(fig_side, use_container_width=True)
+        with col1:
+            st.markdown('<div class="viz-container"><h4>Aisle View</h4></div>', unsafe_allow_html=True)
+            fig_aisle = create_plotly_visualization(result, loc_w, loc_d, loc_h, loc_choice, pallet_choice, "aisle")
+            st.plotly_chart(fig_aisle, use_container_width=True)
+
+        with col2:
+            st.markdown('<div class="viz-container"><h4>Top View</h4></div>', unsafe_allow_html=True)
+            fig_top = create_plotly_visualization(result, loc_w, loc_d, loc_h, loc_choice, pallet_choice, "top")
+            st.plotly_chart(fig_top, use_container_width=True)
+
+        with col3:
+            st.markdown('<div class="viz-container"><h4>Side View</h4></div>', unsafe_allow_html=True)
+            fig_side = create_plotly_visualization(result, loc_w, loc_d, loc_h, loc_choice, pallet_choice, "side")
+            st.plotly_chart(fig_side, use_container_width=True)
+
+# Function to build the ranking table of location/pallet combinations for one SKU
+def build_ranking_table(sku_rows, metric):
+    metric_label = RANKING_METRICS[metric]
+    table = pd.DataFrame([{
+        'Rank': row['rank'],
+        'Location': row['location'],
+        'Pallet': row['pallet'],
+        'Units': row['quantity'],
+        metric_label: row['score'],
+        'Upper Bound': row['bound_score'],
+        'Status': row['status'].title()
+    } for row in sku_rows])
+
+    if metric != "units":
+        table[metric_label] = table[metric_label].map(lambda v: f"{v:.1%}" if pd.notna(v) else "")
+        table['Upper Bound'] = table['Upper Bound'].map(lambda v: f"{v:.1%}")
+    else:
+        table['Units'] = table['Units'].astype('Int64')
+        table['Upper Bound'] = table['Upper Bound'].astype(int)
+
+    return table
+
+# Function to submit a re-solve with the batch budget for results cut short by a shorter one. Refinements are
+# optional: they are skipped when this session has no free solver slot rather than blocking the page.
+def start_refinement(result, pallet_space, engine, time_budget_ms):
+    if result is None or result.complete or not time_budget_ms or time_budget_ms >= BATCH_TIME_BUDGET_MS:
+        return None
+    return get_session_executor().try_submit(solve_problem, result.original_dims, pallet_space, engine, BATCH_TIME_BUDGET_MS)
+
+# Function to cancel the refinements of a previous optimization that no worker has started yet
+def cancel_refinements(optimization):
+    executor = get_session_executor()
+    for entry in optimization['entries']:
+        if entry and entry.get('refinement') is not None:
+            executor.cancel(entry['refinement'])
+            entry['refinement'] = None
+
+# Function to swap in background refinements that have finished; returns how many are still running
+def collect_refinements(optimization):
+    pending = 0
+    for entry in optimization['entries']:
+        refinement = entry.get('refinement')
+        if refinement is None:
+            continue
+        if not refinement.done():
+            pending += 1
+            continue
+        entry['refinement'] = None
+        if refinement.exception() is None:
+            refined = name_result(refinement.result(), entry['result'].sku_name)
+            if refined is not None and refined.max_quantity >= entry['result'].max_quantity:
+                entry['result'] = refined
+    return pending
+
+# Seconds between checks for finished background refinements while any are running
+REFINEMENT_POLL_S = 1.0
+
+# Fragment that polls the running refinements and reruns the page as soon as one has finished
+@st.fragment(run_every=REFINEMENT_POLL_S)
+def poll_refinements(optimization):
+    refinements = [entry['refinement'] for entry in optimization['entries'] if entry and entry.get('refinement')]
+    if any(refinement.done() for refinement in refinements):
+        st.rerun()
+    st.info(
+        f"Improving {len(refinements)} result(s) in the background for up to {BATCH_TIME_BUDGET_MS / 1000:.0f}s each; "
+        "they update here automatically."
+    )
+
+# Function to optimize an uploaded SKU list, streaming the summary table while SKUs finish
+def run_bulk_optimization(skus, selection_mode, engine, time_budget_ms,
+                          loc_choice=None, pallet_choice=None, rank_metric=None, top_n=None):
+    executor = get_session_executor()
+    progress = st.progress(0.0, text=f"Optimizing {len(skus)} SKUs...")
+    summary = st.empty()
+    entries = [None] * len(skus)
+
+    if selection_mode == "Manual":
+        loc_w, loc_d, loc_h, loc_maxw = LOCATION_TYPES[loc_choice]
+        solved = iter_solve_skus(
+            skus, (loc_w, loc_d, loc_h), loc_maxw, PALLET_TYPES[pallet_choice], engine, executor, time_budget_ms
+        )
+        updates = (
+            (position, {'sku_name': skus['name'][position], 'location': loc_choice, 'pallet': pallet_choice, 'result': result})
+            for position, result in solved
+        )
+    else:
+        def rank_each_sku():
+            for position in range(len(skus)):
+                best = rank_configurations(
+                    skus.iloc[[position]], LOCATION_TYPES, PALLET_TYPES, rank_metric, top_n, executor,
+                    engine=engine, time_budget_ms=time_budget_ms
+                )[0]
+                yield position, {'sku_name': best['sku_name'], 'location': best['location'],
+                                 'pallet': best['pallet'], 'result': best['result']}
+        updates = rank_each_sku()
+
+    # Redraw the table at most twice a second so hundreds of SKUs don't flood the browser
+    last_render = 0.0
+    for done, (position, entry) in enumerate(updates, start=1):
+        entries[position] = entry
+        progress.progress(done / len(skus), text=f"Optimized {done} of {len(skus)} SKUs")
+        if time.time() - last_render > 0.5 or done == len(skus):
+            render_bulk_summary(summary, entries)
+            last_render = time.time()
+
+    progress.empty()
+    summary.empty()
+    return {'mode': 'bulk', 'entries': entries}
+
+# Function to collect the pick-face capacity of every optimized SKU/location
+def build_replenishment_capacities(optimization):
+    rows = []
+    for entry in optimization['entries']:
+        if entry is None or entry['result'] is None:
+            continue
+        result = entry['result']
+        rows.append({
+            'sku': result.sku_name,
+            'location': entry.get('location', optimization.get('location')),
+            'capacity': result.max_quantity
+        })
+    return pd.DataFrame(rows, columns=['sku', 'location', 'capacity'])
+
+# Function to render the pick-face depletion and replenishment simulation
+def render_replenishment_simulator(optimization):
+    capacities = build_replenishment_capacities(optimization)
+    if capacities.empty:
+        return
+
+    with st.expander("Pick-Face Replenishment Simulation"):
+        with st.form("replenishment_form"):
+            source = st.radio("Pick Events", ["Synthetic", "Upload CSV"], horizontal=True)
+            uploaded = st.file_uploader("Pick events CSV (timestamp, sku, quantity)", type="csv")
+            col1, col2, col3, col4 = st.columns(4)
+            days = col1.number_input("Days", min_value=1, max_value=3650, value=90)
+            daily_picks = col2.number_input("Picks per SKU per day", min_value=0.0, value=10.0, step=1.0)
+            pick_quantity = col3.number_input("Units per pick", min_value=1.0, value=2.0, step=0.5)
+            reorder_pct = col4.number_input("Reorder point (% of capacity)", min_value=0, max_value=99, value=0)
+            submitted = st.form_submit_button("Simulate Replenishment")
+
+        if submitted:
+            if source == "Upload CSV":
+                if uploaded is None:
+                    st.warning("Please upload a pick events CSV.")
+                    return
+                try:
+                    events = load_pick_events(uploaded)
+                except ValueError as error:
+                    st.error(str(error))
+                    return
+            else:
+                events = generate_pick_events(capacities['sku'].unique(), days, daily_picks, pick_quantity)
+
+            if events.empty:
+                st.warning("No pick events to simulate. Upload a CSV with valid rows or increase the picks per day.")
+                st.session_state.pop('replenishment', None)
+                return
+
+            start_time = time.time()
+            st.session_state['replenishment'] = simulate_replenishment(events, capacities, reorder_pct / 100)
+            st.session_state['replenishment_stats'] = (len(events), time.time() - start_time)
+
+        summary = st.session_state.get('replenishment')
+        if summary is None:
+            return
+
+        n_events, elapsed = st.session_state['replenishment_stats']
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Replenishments per Day", f"{summary['replenishments_per_day'].sum():.1f}")
+        col2.metric("Short Picks", f"{summary['short_picks'].sum():,}")
+        col3.metric("Pick Events Simulated", f"{n_events:,}", f"{elapsed:.2f}s", delta_color="off")
+
+        st.dataframe(
+            summary.sort_values('replenishments_per_day', ascending=False), hide_index=True, use_container_width=True,
+            column_config={
+                'reorder_point': st.column_config.NumberColumn(format="%.0f"),
+                'units_picked': st.column_config.NumberColumn(format="%.0f"),
+                'replenishments_per_day': st.column_config.NumberColumn(format="%.2f"),
+                'days_between_replenishments': st.column_config.NumberColumn(format="%.1f"),
+                'units_short': st.column_config.NumberColumn(format="%.0f"),
+            }
+        )
+
+# === UI ===
+st.caption("Advanced 3D optimization with intelligent orientation analysis and layer-by-layer planning")
+
+st.sidebar.header("SKU Configuration")
+sku_input_mode = st.sidebar.radio("SKU Input", ["Manual Entry", "Bulk Upload"], horizontal=True)
+bulk_mode = sku_input_mode == "Bulk Upload"
+skus = create_bulk_sku_inputs() if bulk_mode else create_sku_inputs()
+
+st.sidebar.header("Location & Pallet")
+selection_mode = st.sidebar.radio("Selection Mode", ["Manual", "Auto-select best"], horizontal=True)
+loc_choice = pallet_choice = rank_metric = top_n = None
+
+if selection_mode == "Manual":
+    loc_choice = st.sidebar.selectbox("Location Type", LOCATION_TYPE_LIST)
+    pallet_choice = st.sidebar.selectbox("Pallet Type", PALLET_TYPE_LIST)
+else:
+    rank_metric = st.sidebar.selectbox("Rank By", list(RANKING_METRICS), format_func=RANKING_METRICS.get)
+    top_n = st.sidebar.number_input("Combinations to rank fully", min_value=1, max_value=len(LOCATION_TYPES) * len(PALLET_TYPES), value=3)
+
+packing_engine = st.sidebar.selectbox("Packing Engine", list(PACKING_ENGINES), format_func=PACKING_ENGINES.get)
+time_budget_ms = st.sidebar.number_input(
+    "Time Budget (ms, 0 = no limit)", min_value=0, step=50, key=f"time_budget_{sku_input_mode}",
+    value=BATCH_TIME_BUDGET_MS if bulk_mode else INTERACTIVE_TIME_BUDGET_MS,
+    help="Per SKU. The search stops improving once the budget is spent and the best solution so far is shown; very large packings can take longer to lay out. Interactive runs may keep improving in the background."
+)
+
+if st.button("Optimize Storage Configuration"):
+    if skus is None or skus.empty:
+        st.error("Please enter at least one SKU.")
+        st.stop()
+
+    # A new optimization changes the pick-face capacities, so drop any earlier simulation,
+    # and frees the solver slots held by refinements of the previous one
+    st.session_state.pop('replenishment', None)
+    if st.session_state.get('optimization'):
+        cancel_refinements(st.session_state['optimization'])
+
+    if bulk_mode:
+        try:
+            st.session_state['optimization'] = run_bulk_optimization(
+                skus, selection_mode, packing_engine, time_budget_ms or None,
+                loc_choice, pallet_choice, rank_metric, top_n
+            )
+        except SolverError as error:
+            st.warning(str(error))
+            st.stop()
+
+    elif selection_mode == "Manual":
+        loc_w, loc_d, loc_h, loc_maxw = LOCATION_TYPES[loc_choice]
+        pallet_dims = PALLET_TYPES[pallet_choice]
+        pallet_space = prepare_pallet_space((loc_w, loc_d, loc_h), loc_maxw, pallet_dims)
+
+        try:
+            results = pack_skus_max(
+                skus, (loc_w, loc_d, loc_h), loc_maxw, pallet_dims, packing_engine, get_session_executor(),
+                time_budget_ms or None
+            )
+        except SolverError as error:
+            st.warning(str(error))
+            st.stop()
+
+        st.session_state['optimization'] = {
+            'mode': 'manual',
+            'location': loc_choice,
+            'pallet': pallet_choice,
+            'entries': [
+                {'result': result, 'refinement': start_refinement(result, pallet_space, packing_engine, time_budget_ms)}
+                for result in results
+            ]
+        }
+
+    else:
+        try:
+            with st.spinner(f"Evaluating {len(LOCATION_TYPES) * len(PALLET_TYPES)} location/pallet combinations..."):
+                ranking = rank_configurations(
+                    skus, LOCATION_TYPES, PALLET_TYPES, rank_metric, top_n, get_session_executor(),
+                    engine=packing_engine, time_budget_ms=time_budget_ms or None
+                )
+        except SolverError as error:
+            st.warning(str(error))
+            st.stop()
+
+        entries = []
+        for sku_name in dict.fromkeys(row['sku_name'] for row in ranking):
+            sku_rows = [row for row in ranking if row['sku_name'] == sku_name]
+            best = sku_rows[0]
+            found = best['status'] == 'evaluated' and bool(best['quantity'])
+            entries.append({
+                'sku_name': sku_name,
+                'ranking': build_ranking_table(sku_rows, rank_metric),
+                'location': best['location'],
+                'pallet': best['pallet'],
+                'result': best['result'] if found else None,
+                'refinement': start_refinement(best['result'], best['pallet_space'], packing_engine, time_budget_ms)
+                if found else None
+            })
+
+        st.session_state['optimization'] = {'mode': 'auto', 'entries': entries}
+
+optimization = st.session_state.get('optimization')
+
+if optimization:
+    if collect_refinements(optimization):
+        poll_refinements(optimization)
+
+    if not any(entry['result'] for entry in optimization['entries']):
+        st.error("No items could be packed. Check SKU dimensions and location size.")
+
+    elif optimization['mode'] == 'bulk':
+        entries = optimization['entries']
+        st.subheader("Bulk Optimization Summary")
+        render_bulk_summary(st, entries)
+
+        # Layer cards and 3D views are only built for the SKUs the user opens
+        selected = st.multiselect(
+            "Show layer details and 3D views for", [entry['sku_name'] for entry in entries if entry['result']],
+            key="bulk_details"
+        )
+        for entry in entries:
+            if entry['sku_name'] in selected:
+                with st.expander(f"{entry['sku_name']} - {entry['location']} / {entry['pallet']}", expanded=True):
+                    render_sku_result(entry['result'], entry['location'], entry['pallet'])
+
+    elif optimization['mode'] == 'manual':
+        st.subheader("Storage Configuration Summary")
+        render_configuration_summary(optimization['location'], optimization['pallet'])
+
+        st.subheader("Optimization Results")
+        
+        for entry in optimization['entries']:
+            render_sku_result(entry['result'], optimization['location'], optimization['pallet'])
+
+    else:
+        for entry in optimization['entries']:
+            sku_name = entry['sku_name']
+
+            st.subheader(f"Best Location & Pallet Ranking - {sku_name}")
+            st.dataframe(entry['ranking'], hide_index=True, use_container_width=True)
+
+            if entry['result'] is None:
+                st.warning(f"**{sku_name}:** does not fit any location/pallet combination.")
+                continue
+
+            st.subheader(f"Storage Configuration Summary - {sku_name}")
+            render_configuration_summary(entry['location'], entry['pallet'])
+
+            st.subheader(f"Optimization Results - {sku_name}")
+            render_sku_result(entry['result'], entry['location'], entry['pallet'])
+
+    render_replenishment_simulator(optimization)
 
 else:
     st.info("Configure your SKU details in the sidebar and click **Optimize Storage Configuration** to begin the analysis.")
 
+render_solver_metrics()
+
 # Footer
 st.markdown("""
 <div class="footer">
@@ -0,0 +1,290 @@
+# Imports
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from packing import BATCH_TIME_BUDGET_MS, ENGINE_SOLVERS, prepare_pallet_space, quantity_upper_bound, solve_sku
+
+# Engine every other engine is compared against (the current py3dbp search)
+REFERENCE_ENGINE = "py3dbp"
+
+# Location/pallet catalogs the generated problems are drawn from
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOCATIONS_CSV = os.path.join(BASE_DIR, "locations.csv")
+PALLETS_CSV = os.path.join(BASE_DIR, "pallets.csv")
+
+# Ranges for generated SKUs (inches / lbs, to 0.01 like the app inputs) and the largest unit count kept
+# (py3dbp slows sharply with count)
+SKU_SIZE_RANGE = (2.0, 30.0)
+SKU_WEIGHT_RANGE = (0.5, 40.0)
+
+# Lighter SKUs for the large problems: heavy units hit the location weight cap long before they fill it
+LARGE_SKU_WEIGHT_RANGE = (0.05, 2.0)
+DEFAULT_MAX_UNITS = 100
+
+# Random problems drawn per requested case before giving up on the unit range
+MAX_DRAWS_PER_CASE = 200
+
+# Slack for float32 placements when checking bounds, overlap and orientation (inches)
+GEOMETRY_TOLERANCE = 1e-3
+
+# Candidate pairs tested per block in the overlap sweep, bounding its memory
+OVERLAP_PAIR_BLOCK = 250_000
+
+# Function to generate packing problems from the location/pallet catalogs and random SKUs
+def generate_cases(n_cases, seed=0, max_units=DEFAULT_MAX_UNITS, min_units=1, bound_engine=REFERENCE_ENGINE,
+                   weight_range=SKU_WEIGHT_RANGE):
+    """Keeps problems whose unit bound for bound_engine is between min_units and max_units (None: no cap).
+    The py3dbp estimate stops at MAX_SEARCH_QUANTITY, so ranges above it need the layered bound."""
+    locations = pd.read_csv(LOCATIONS_CSV)
+    pallets = pd.read_csv(PALLETS_CSV)
+    rng = np.random.default_rng(seed)
+
+    cases, draws = [], 0
+    while len(cases) < n_cases:
+        if draws >= MAX_DRAWS_PER_CASE * n_cases:
+            raise ValueError(
+                f"Only {len(cases)} of {n_cases} problems in {draws} draws have a {bound_engine} bound "
+                f"between {min_units} and {max_units} units"
+            )
+        batch = 2 * (n_cases - len(cases))
+        draws += batch
+        loc_rows = rng.integers(len(locations), size=batch)
+        pallet_rows = rng.integers(len(pallets), size=batch)
+        sizes = np.round(rng.uniform(*SKU_SIZE_RANGE, size=(batch, 3)), 2)
+        weights = np.round(rng.uniform(*weight_range, size=batch), 2)
+
+        for loc_row, pallet_row, size, weight in zip(loc_rows, pallet_rows, sizes, weights):
+            location, pallet = locations.iloc[loc_row], pallets.iloc[pallet_row]
+            pallet_space = prepare_pallet_space(
+                (float(location['width']), float(location['depth']), float(location['height'])),
+                float(location['max_weight']),
+                (float(pallet['width']), float(pallet['depth']), float(pallet['height']), float(pallet['weight']))
+            )
+            sku_dims = tuple(float(v) for v in size) + (float(weight),)
+            estimate = quantity_upper_bound(sku_dims, pallet_space, bound_engine)
+            if estimate >= max(min_units, 1) and (max_units is None or estimate <= max_units):
+                cases.append({
+                    'case': len(cases),
+                    'location': location['name'],
+                    'pallet': pallet['name'],
+                    'sku_dims': sku_dims,
+                    'pallet_space': pallet_space,
+                })
+                if len(cases) == n_cases:
+                    break
+    return cases
+
+# Function to count pairs of boxes that intersect on all three axes by more than the tolerance
+def count_overlapping_pairs(origins, ends, tol=GEOMETRY_TOLERANCE):
+    """Sweep along the axis with the fewest candidates: sorted by origin on that axis, a box can
+    only overlap the boxes after it that start before it ends, so only those pairs are tested."""
+    n = len(origins)
+    if n < 2:
+        return 0
+
+    best = None
+    for axis in range(3):
+        order = np.argsort(origins[:, axis], kind='stable')
+        stop = np.searchsorted(origins[order, axis], ends[order, axis] - tol, side='left')
+        windows = np.maximum(stop - np.arange(n) - 1, 0)
+        if best is None or windows.sum() < best[1].sum():
+            best = (order, windows)
+    order, windows = best
+    origins, ends = origins[order], ends[order]
+
+    # Test each box against its window, in blocks of whole boxes holding about OVERLAP_PAIR_BLOCK pairs
+    cumulative = np.concatenate([[0], np.cumsum(windows)])
+    overlapping_pairs, start = 0, 0
+    while start < n:
+        end = max(start + 1, int(np.searchsorted(cumulative, cumulative[start] + OVERLAP_PAIR_BLOCK, side='right')) - 1)
+        first = np.repeat(np.arange(start, end), windows[start:end])
+        second = first + 1 + np.arange(len(first)) - np.repeat(cumulative[start:end] - cumulative[start], windows[start:end])
+        intersects = ((np.minimum(ends[first], ends[second]) - np.maximum(origins[first], origins[second])) > tol).all(axis=1)
+        overlapping_pairs += int(intersects.sum())
+        start = end
+    return overlapping_pairs
+
+# Function to count rule violations in a solved placement array (x, y, z, w, d, h per unit, z vertical)
+def validate_placements(placements, quantity, sku_dims, pallet_space):
+    pallet_dims, _, available_height, available_weight = pallet_space
+    placements = np.asarray(placements, dtype=np.float64).reshape(-1, 6)
+    origins, sizes = placements[:, :3], placements[:, 3:]
+    limits = np.array([pallet_dims[0], pallet_dims[1], available_height])
+    tol = GEOMETRY_TOLERANCE
+
+    # Every unit must be one of the SKU's orientations, i.e. a permutation of its dimensions
+    orientation_errors = np.abs(np.sort(sizes, axis=1) - np.sort(sku_dims[:3])).max(axis=1, initial=0) > tol
+
+    out_of_bounds = ((origins < -tol) | (origins + sizes > limits + tol)).any(axis=1)
+    overlapping_pairs = count_overlapping_pairs(origins, origins + sizes, tol)
+
+    return {
+        'count_mismatch': int(len(placements) != quantity),
+        'bad_orientations': int(orientation_errors.sum()),
+        'out_of_bounds': int(out_of_bounds.sum()),
+        'overlapping_pairs': overlapping_pairs,
+        'overweight': int(quantity * sku_dims[3] > available_weight + tol),
+    }
+
+# Function to solve one case with every engine, timing and validating each (runs in a worker)
+def run_case(case, engines, time_budget_ms=None):
+    rows = []
+    for engine in engines:
+        row = {'case': case['case'], 'location': case['location'], 'pallet': case['pallet'],
+               'sku_dims': case['sku_dims'], 'engine': engine, 'error': None}
+        started = time.perf_counter()
+        try:
+            result = solve_sku(f"CASE_{case['case']}", case['sku_dims'], case['pallet_space'], engine, time_budget_ms)
+        except Exception as error:  # a crashing engine is a finding, not a harness failure
+            result, row['error'] = None, repr(error)
+        row['time_ms'] = (time.perf_counter() - started) * 1000
+
+        row['quantity'] = result.max_quantity if result else 0
+        row['complete'] = result.complete if result else True
+        placements = result.placements if result else np.empty((0, 6))
+        row.update(validate_placements(placements, row['quantity'], case['sku_dims'], case['pallet_space']))
+        row['valid'] = row['error'] is None and not any(
+            row[check] for check in ('count_mismatch', 'bad_orientations', 'out_of_bounds', 'overlapping_pairs', 'overweight')
+        )
+        rows.append(row)
+    return rows
+
+# Function to run every case across worker processes; returns one row per case and engine
+def run_cases(cases, engines, time_budget_ms=None, max_workers=None, progress_every=100):
+    max_workers = max_workers or os.cpu_count() or 1
+    rows = []
+    with ProcessPoolExecutor(max_workers) as executor:
+        chunksize = max(1, len(cases) // (max_workers * 8))
+        results = executor.map(run_case, cases, [engines] * len(cases), [time_budget_ms] * len(cases), chunksize=chunksize)
+        for done, case_rows in enumerate(results, 1):
+            rows.extend(case_rows)
+            if progress_every and done % progress_every == 0:
+                print(f"{done}/{len(cases)} cases", flush=True)
+    return pd.DataFrame(rows)
+
+# Function to line each candidate engine up against the reference on the same case
+def compare_engines(results, reference=REFERENCE_ENGINE):
+    base = results[results['engine'] == reference].set_index('case')
+    comparisons = []
+    for engine, rows in results[results['engine'] != reference].groupby('engine'):
+        rows = rows.set_index('case')
+        comparisons.append(pd.DataFrame({
+            'case': rows.index,
+            'engine': engine,
+            'location': rows['location'],
+            'pallet': rows['pallet'],
+            'sku_dims': rows['sku_dims'],
+            'reference_quantity': base['quantity'].reindex(rows.index),
+            'quantity': rows['quantity'],
+            'quantity_diff': rows['quantity'] - base['quantity'].reindex(rows.index),
+            'reference_time_ms': base['time_ms'].reindex(rows.index),
+            'time_ms': rows['time_ms'],
+            'speedup': base['time_ms'].reindex(rows.index) / rows['time_ms'].clip(lower=1e-3),
+            'reference_valid': base['valid'].reindex(rows.index),
+            'valid': rows['valid'],
+        }).reset_index(drop=True))
+    return pd.concat(comparisons, ignore_index=True) if comparisons else pd.DataFrame()
+
+# Function to summarize each candidate engine: validity, win/tie/loss on quantity and speedup
+def summarize_comparison(comparison, results, reference=REFERENCE_ENGINE):
+    reference_rows = results[results['engine'] == reference]
+    summary = [{
+        'engine': reference, 'cases': len(reference_rows), 'invalid': int((~reference_rows['valid']).sum()),
+        'wins': np.nan, 'ties': np.nan, 'losses': np.nan, 'mean_diff': np.nan, 'min_diff': np.nan,
+        'max_diff': np.nan, 'median_speedup': np.nan, 'geomean_speedup': np.nan,
+        'total_time_s': reference_rows['time_ms'].sum() / 1000,
+    }]
+    for engine, rows in comparison.groupby('engine'):
+        summary.append({
+            'engine': engine,
+            'cases': len(rows),
+            'invalid': int((~rows['valid']).sum()),
+            'wins': int((rows['quantity_diff'] > 0).sum()),
+            'ties': int((rows['quantity_diff'] == 0).sum()),
+            'losses': int((rows['quantity_diff'] < 0).sum()),
+            'mean_diff': rows['quantity_diff'].mean(),
+            'min_diff': rows['quantity_diff'].min(),
+            'max_diff': rows['quantity_diff'].max(),
+            'median_speedup': rows['speedup'].median(),
+            'geomean_speedup': float(np.exp(np.log(rows['speedup']).mean())),
+            'total_time_s': rows['time_ms'].sum() / 1000,
+        })
+    return pd.DataFrame(summary)
+
+# Function to summarize solutions checked for validity only (no reference to compare quantities against)
+def summarize_validation(results):
+    return pd.DataFrame([{
+        'engine': engine,
+        'cases': len(rows),
+        'invalid': int((~rows['valid']).sum()),
+        'incomplete': int((~rows['complete']).sum()),
+        'median_quantity': rows['quantity'].median(),
+        'max_quantity': rows['quantity'].max(),
+        'median_time_ms': rows['time_ms'].median(),
+        'max_time_ms': rows['time_ms'].max(),
+    } for engine, rows in results.groupby('engine')])
+
+# Command line entry point: python engine_diff.py --cases 2000 --workers 8
+def main():
+    parser = argparse.ArgumentParser(description="Differential quality and speed check of the packing engines")
+    parser.add_argument("--cases", type=int, default=1000)
+    parser.add_argument("--engines", default=",".join(ENGINE_SOLVERS),
+                        help=f"comma-separated engines; {REFERENCE_ENGINE} is always included as the reference")
+    parser.add_argument("--max-units", type=int, default=DEFAULT_MAX_UNITS, help="skip problems estimated above this many units")
+    parser.add_argument("--time-budget-ms", type=int, help="per-solve time budget (default: run to completion)")
+    parser.add_argument("--large-cases", type=int, default=0,
+                        help=f"also validate the other engines on this many problems above --max-units, without "
+                             f"{REFERENCE_ENGINE} (default budget {BATCH_TIME_BUDGET_MS} ms per solve)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the per-case comparison to this CSV file")
+    args = parser.parse_args()
+
+    engines = [REFERENCE_ENGINE] + [e for e in args.engines.split(",") if e and e != REFERENCE_ENGINE]
+    unknown = [engine for engine in engines if engine not in ENGINE_SOLVERS]
+    if unknown:
+        parser.error(f"unknown engine(s): {', '.join(unknown)}; choose from {', '.join(ENGINE_SOLVERS)}")
+
+    cases = generate_cases(args.cases, args.seed, args.max_units)
+    started = time.perf_counter()
+    results = run_cases(cases, engines, args.time_budget_ms, args.workers)
+    print(f"Solved {len(cases)} cases with {len(engines)} engines in {time.perf_counter() - started:.1f}s")
+
+    comparison = compare_engines(results)
+    with pd.option_context('display.max_columns', None, 'display.width', 250, 'display.float_format', "{:.2f}".format):
+        print(summarize_comparison(comparison, results).to_string(index=False))
+
+        invalid = results[~results['valid']]
+        if len(invalid):
+            print("\nInvalid solutions:")
+            print(invalid.drop(columns=['sku_dims']).head(20).to_string(index=False))
+
+        regressions = comparison[comparison['quantity_diff'] < 0] if len(comparison) else comparison
+        if len(regressions):
+            print("\nLargest regressions against the reference:")
+            print(regressions.nsmallest(10, 'quantity_diff').to_string(index=False))
+
+        # Problems too large for the reference: check the candidates' solutions are valid, not how many fit
+        candidates = engines[1:]
+        if args.large_cases and candidates:
+            large_cases = generate_cases(
+                args.large_cases, args.seed, max_units=None, min_units=args.max_units + 1, bound_engine="layered",
+                weight_range=LARGE_SKU_WEIGHT_RANGE
+            )
+            large = run_cases(large_cases, candidates, args.time_budget_ms or BATCH_TIME_BUDGET_MS, args.workers)
+            print(f"\nLarge problems (validation only, {len(large_cases)} cases):")
+            print(summarize_validation(large).to_string(index=False))
+
+            invalid = large[~large['valid']]
+            if len(invalid):
+                print("\nInvalid large solutions:")
+                print(invalid.drop(columns=['sku_dims']).head(20).to_string(index=False))
+
+    if args.output:
+        comparison.to_csv(args.output, index=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+# Imports
+import argparse
+import contextlib
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import numpy as np
+import pandas as pd
+from websockets.sync.client import connect
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.NumberInput_pb2 import NumberInput
+from streamlit.proto.WidgetStates_pb2 import WidgetState, WidgetStates
+from streamlit.testing.v1.element_tree import parse_tree_from_messages
+from packing import PACKING_ENGINES
+
+# Default app under test and the local server the harness starts for it
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(BASE_DIR, "app.py")
+DEFAULT_PORT = 8599
+SERVER_START_TIMEOUT_S = 60
+
+# Longest every session may take to connect before a load level starts without the stragglers
+SESSION_START_TIMEOUT_S = 60
+
+# Location/pallet catalogs the Manual-mode submissions draw from
+LOCATIONS_CSV = os.path.join(BASE_DIR, "locations.csv")
+PALLETS_CSV = os.path.join(BASE_DIR, "pallets.csv")
+
+# Text shared by the app's solver-busy warnings (session limit and full queue), and by its solver-failure warnings
+REJECTION_TEXT = "Please try again shortly"
+FAILURE_TEXT = "Please run the optimization again"
+
+# How often the resource sampler reads CPU and memory
+SAMPLE_INTERVAL_S = 0.2
+
+# Ranges for the synthetic SKUs each planner submits (inches / lbs)
+SKU_DIMENSION_RANGES = {'width': (4, 24), 'depth': (4, 24), 'height': (3, 18), 'weight': (1, 30)}
+
+# Function to start the app on a local headless Streamlit server and wait until it is healthy
+def start_server(app_path=APP_PATH, port=DEFAULT_PORT):
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", app_path, "--server.headless", "true",
+         "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + SERVER_START_TIMEOUT_S
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://localhost:{port}/_stcore/health", timeout=1) as response:
+                if response.status == 200:
+                    return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"Streamlit server did not start on port {port} within {SERVER_START_TIMEOUT_S}s")
+
+# Function to read CPU seconds and resident memory (bytes) of a process and all its descendants (Linux /proc)
+def process_tree_usage(root_pid):
+    ticks, page_size = os.sysconf("SC_CLK_TCK"), os.sysconf("SC_PAGE_SIZE")
+    processes = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        # Fields after the command name: state, ppid, ... utime (11), stime (12), ... rss (21)
+        processes[int(entry)] = (int(fields[1]), (int(fields[11]) + int(fields[12])) / ticks, int(fields[21]) * page_size)
+
+    tree, frontier = {root_pid}, [root_pid]
+    while frontier:
+        parent = frontier.pop()
+        children = [pid for pid, (ppid, _, _) in processes.items() if ppid == parent and pid not in tree]
+        tree.update(children)
+        frontier.extend(children)
+
+    usage = [processes[pid] for pid in tree if pid in processes]
+    return sum(cpu for _, cpu, _ in usage), sum(rss for _, _, rss in usage)
+
+class ResourceSampler(threading.Thread):
+    """Samples the server's process-tree CPU and memory in the background while a load level runs."""
+
+    def __init__(self, pid, interval=SAMPLE_INTERVAL_S):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while True:
+            self.samples.append((time.perf_counter(),) + process_tree_usage(self.pid))
+            if self._stop_event.wait(self.interval):
+                break
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.samples.append((time.perf_counter(),) + process_tree_usage(self.pid))
+
+    # Average and peak CPU (% of one core) and peak resident memory over the samples
+    def summary(self):
+        samples = np.array(self.samples)
+        elapsed = samples[-1, 0] - samples[0, 0]
+        cpu = np.diff(samples[:, 1]) / np.maximum(np.diff(samples[:, 0]), 1e-9) * 100
+        return {
+            'cpu_avg_pct': (samples[-1, 1] - samples[0, 1]) / elapsed * 100 if elapsed > 0 else 0.0,
+            'cpu_peak_pct': float(cpu.max()) if len(cpu) else 0.0,
+            'rss_peak_mb': samples[:, 2].max() / 2**20,
+        }
+
+# Function to build the widget state a browser would send for a widget set to value
+def build_widget_state(widget, value):
+    state = WidgetState(id=widget.proto.id)
+    if widget.type == "button":
+        state.trigger_value = True
+    elif widget.type == "number_input" and widget.proto.data_type == NumberInput.INT:
+        state.int_value = int(value)
+    elif widget.type == "number_input":
+        state.double_value = float(value)
+    else:
+        # Radios, selectboxes and text inputs send the displayed option or text
+        state.string_value = str(value)
+    return state
+
+class SessionDriver:
+    """One browser-like session: reruns the script over the server's websocket, carrying widget values
+    forward like the frontend does, and parses each run's output with Streamlit's testing element tree."""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.widget_states = {}  # widget id -> last value sent, resent on every rerun
+        self.tree = None
+
+    # Rerun the script (optionally with a one-off trigger such as a button click); returns bytes received
+    def run(self, trigger=None):
+        widget_states = WidgetStates()
+        widget_states.widgets.extend(self.widget_states.values())
+        if trigger is not None:
+            widget_states.widgets.append(build_widget_state(trigger, True))
+
+        message = BackMsg()
+        message.rerun_script.widget_states.CopyFrom(widget_states)
+        self.websocket.send(message.SerializeToString())
+
+        deltas, received = [], 0
+        while True:
+            data = self.websocket.recv()
+            received += len(data)
+            forward = ForwardMsg()
+            forward.ParseFromString(data)
+            kind = forward.WhichOneof("type")
+            if kind == "delta":
+                deltas.append(forward)
+            elif kind == "script_finished":
+                break
+
+        self.tree = parse_tree_from_messages(deltas)
+        return received
+
+    def set_value(self, widget, value):
+        self.widget_states[widget.proto.id] = build_widget_state(widget, value)
+
+    # Find a widget of the given type by its label
+    def widget(self, widget_type, label):
+        return next(element for element in self.tree.get(widget_type) if element.label == label)
+
+# Function to draw a realistic SKU set for one submission
+def generate_sku_set(rng, max_skus):
+    n_skus = int(rng.integers(1, max_skus + 1))
+    sizes = {column: np.round(rng.uniform(low, high, n_skus), 1) for column, (low, high) in SKU_DIMENSION_RANGES.items()}
+    return pd.DataFrame({'name': [f"LT_{i+1}" for i in range(n_skus)], **sizes})
+
+# Function to enter a SKU set and selection settings into a session's sidebar
+def fill_session_inputs(session, skus, selection_mode, engine_label, location=None, pallet=None):
+    session.set_value(session.widget("radio", "Selection Mode"), selection_mode)
+    session.set_value(session.widget("selectbox", "Packing Engine"), engine_label)
+    session.set_value(session.widget("number_input", "Number of SKU types"), len(skus))
+    session.run()
+
+    # The location and pallet pickers only appear once Manual mode is selected
+    if selection_mode == "Manual":
+        session.set_value(session.widget("selectbox", "Location Type"), location)
+        session.set_value(session.widget("selectbox", "Pallet Type"), pallet)
+
+    for i, sku in enumerate(skus.itertuples()):
+        session.set_value(session.tree.text_input(key=f"name_{i}"), sku.name)
+        session.set_value(session.tree.number_input(key=f"width_{i}"), sku.width)
+        session.set_value(session.tree.number_input(key=f"depth_{i}"), sku.depth)
+        session.set_value(session.tree.number_input(key=f"height_{i}"), sku.height)
+        session.set_value(session.tree.number_input(key=f"weight_{i}"), sku.weight)
+
+# Function to wait for every session to connect; a timed-out (broken) barrier lets the rest go ahead
+def wait_for_sessions(start_barrier):
+    try:
+        start_barrier.wait(SESSION_START_TIMEOUT_S)
+    except threading.BrokenBarrierError:
+        pass
+
+# Function to simulate one planner: open the app, then submit SKU sets and time each optimization.
+# Failures are recorded as status "error" per request, so one broken session cannot stall the level.
+def run_session(session_id, url, n_requests, mode, engine_label, max_skus, seed, start_barrier, records,
+                locations, pallets):
+    rng = np.random.default_rng([seed, session_id])
+
+    with contextlib.ExitStack() as stack:
+        try:
+            session = SessionDriver(stack.enter_context(connect(url, subprotocols=["streamlit"], max_size=None)))
+            session.run()
+        except Exception as error:
+            records.append({'session': session_id, 'request': None, 'status': "error", 'error': repr(error)})
+            session = None
+        wait_for_sessions(start_barrier)
+        if session is None:
+            return
+
+        for request in range(n_requests):
+            skus = generate_sku_set(rng, max_skus)
+            selection_mode = mode if mode != "mixed" else str(rng.choice(["Manual", "Auto-select best"]))
+            record = {'session': session_id, 'request': request, 'mode': selection_mode, 'skus': len(skus)}
+            try:
+                fill_session_inputs(session, skus, selection_mode, engine_label,
+                                    str(rng.choice(locations)), str(rng.choice(pallets)))
+
+                started = time.perf_counter()
+                received = session.run(trigger=session.widget("button", "Optimize Storage Configuration"))
+                latency = time.perf_counter() - started
+            except Exception as error:
+                records.append({**record, 'status': "error", 'error': repr(error)})
+                continue
+
+            tree = session.tree
+            warnings = [element.value for element in tree.warning]
+            failures = [w for w in warnings if FAILURE_TEXT in w]
+            records.append({
+                **record,
+                'latency_ms': latency * 1000,
+                'response_bytes': received,
+                'figure_bytes': sum(len(chart.proto.spec) for chart in tree.get("plotly_chart")),
+                'status': "error" if len(tree.exception) or failures else
+                          "rejected" if any(REJECTION_TEXT in w for w in warnings) else "ok",
+                'error': tree.exception[0].message if len(tree.exception) else failures[0] if failures else None,
+            })
+
+# Function to run one concurrency level and summarize latency, CPU, memory and figure payload
+def run_load_level(url, n_sessions, n_requests, mode="mixed", engine_label="Layer Optimizer",
+                   max_skus=5, seed=0, server_pid=None):
+    records = []
+    locations = pd.read_csv(LOCATIONS_CSV)['name'].tolist()
+    pallets = pd.read_csv(PALLETS_CSV)['name'].tolist()
+    start_barrier = threading.Barrier(n_sessions + 1)
+    threads = [
+        threading.Thread(
+            target=run_session,
+            args=(i, url, n_requests, mode, engine_label, max_skus, seed, start_barrier, records, locations, pallets)
+        )
+        for i in range(n_sessions)
+    ]
+    for thread in threads:
+        thread.start()
+
+    # Measure from the moment every session is connected and starts submitting
+    wait_for_sessions(start_barrier)
+    sampler = ResourceSampler(server_pid) if server_pid else None
+    if sampler:
+        sampler.start()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - started
+    if sampler:
+        sampler.stop()
+
+    requests = pd.DataFrame(records, columns=[
+        'session', 'request', 'mode', 'skus', 'latency_ms', 'response_bytes', 'figure_bytes', 'status', 'error'
+    ])
+    ok = requests[requests['status'] == "ok"]
+    latency = ok['latency_ms'].to_numpy()
+
+    summary = {
+        'sessions': n_sessions,
+        'requests': len(requests),
+        'ok': len(ok),
+        'rejected': int((requests['status'] == "rejected").sum()),
+        'errors': int((requests['status'] == "error").sum()),
+        'throughput_rps': len(ok) / wall_time if wall_time > 0 else 0.0,
+    }
+    for pct in (50, 95, 99):
+        summary[f'latency_p{pct}_ms'] = float(np.percentile(latency, pct)) if len(latency) else np.nan
+    summary['latency_max_ms'] = float(latency.max()) if len(latency) else np.nan
+    if sampler:
+        summary.update(sampler.summary())
+    for column in ('figure', 'response'):
+        payload = ok[f'{column}_bytes'].to_numpy() / 1024
+        summary[f'{column}_p50_kb'] = float(np.percentile(payload, 50)) if len(payload) else np.nan
+        summary[f'{column}_max_kb'] = float(payload.max()) if len(payload) else np.nan
+
+    return summary, requests
+
+# Command line entry point: python loadtest.py --sessions 1,4,8 --requests 5
+def main():
+    parser = argparse.ArgumentParser(description="Headless concurrent-session load test for the SmartPack app")
+    parser.add_argument("--sessions", default="1,2,4,8", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=5, help="optimizations submitted per session")
+    parser.add_argument("--mode", choices=["Manual", "Auto-select best", "mixed"], default="mixed")
+    parser.add_argument("--engine", choices=["layered", "py3dbp"], default="layered")
+    parser.add_argument("--max-skus", type=int, default=5, help="largest SKU set per submission (up to 10)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--app", default=APP_PATH)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--url", help="base URL of an already running server to test instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="process id of that server, for CPU and memory figures")
+    parser.add_argument("--output", help="write the per-level summary to this CSV file")
+    parser.add_argument("--requests-output", help="write every timed request to this CSV file")
+    args = parser.parse_args()
+
+    # Packing engine choices are shown by their display label in the app
+    engine_label = PACKING_ENGINES[args.engine]
+
+    server = None
+    if args.url:
+        url, server_pid = args.url.replace("http", "ws", 1).rstrip("/") + "/_stcore/stream", args.server_pid
+    else:
+        server = start_server(os.path.abspath(args.app), args.port)
+        url, server_pid = f"ws://localhost:{args.port}/_stcore/stream", server.pid
+
+    summaries, all_requests = [], []
+    try:
+        for n_sessions in [int(level) for level in args.sessions.split(",")]:
+            summary, requests = run_load_level(
+                url, n_sessions, args.requests, args.mode, engine_label, min(args.max_skus, 10), args.seed, server_pid
+            )
+            summaries.append(summary)
+            all_requests.append(requests.assign(sessions=n_sessions))
+            print(f"{n_sessions} session(s): p95 {summary['latency_p95_ms']:.0f} ms, "
+                  f"{summary['throughput_rps']:.2f} req/s, {summary['errors']} error(s)", flush=True)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    report = pd.DataFrame(summaries)
+    with pd.option_context('display.max_columns', None, 'display.width', 250, 'display.float_format', "{:.1f}".format):
+        print(report.to_string(index=False))
+
+    if args.output:
+        report.to_csv(args.output, index=False)
+    if args.requests_output:
+        pd.concat(all_requests).to_csv(args.requests_output, index=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,813 @@
+# Imports
+import bisect
+import itertools
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import NamedTuple
+import numpy as np
+from py3dbp import Packer, Bin, Item
+
+# Metrics available for ranking location/pallet combinations
+RANKING_METRICS = {
+    "units": "Units",
+    "utilization": "Space Utilization",
+    "cubic_efficiency": "Cubic Efficiency",
+}
+
+# Packing engines available to pack_skus_max and rank_configurations
+PACKING_ENGINES = {
+    "layered": "Layer Optimizer",
+    "py3dbp": "py3dbp Search",
+}
+
+# Upper limit on the quantity tried by the binary search for a single orientation
+MAX_SEARCH_QUANTITY = 300
+
+# A py3dbp packing probe of q units takes about this many seconds times q³ (refined while searching);
+# under a deadline, probes predicted to overrun the remaining time are shrunk or skipped
+PY3DBP_PROBE_COST = 1e-6
+
+# Tolerance for floating point divisions of dimensions
+EPSILON = 1e-9
+
+# Default time budgets (milliseconds) for the anytime search; None means run to completion
+INTERACTIVE_TIME_BUDGET_MS = 250
+BATCH_TIME_BUDGET_MS = 5000
+
+# Placement arrays hold one row per unit: x, y, z, w, d, h (inches, relative to the pallet top)
+PLACEMENT_DTYPE = np.float32
+PLACEMENT_COLUMNS = ('x', 'y', 'z', 'w', 'd', 'h')
+
+# Compact, immutable packing result kept in session memory instead of the py3dbp Bin graph
+class PackingResult(NamedTuple):
+    sku_name: str
+    max_quantity: int
+    best_orientation: tuple
+    original_dims: tuple
+    pallet_dims: tuple
+    pallet_offset: tuple
+    placements: np.ndarray
+    upper_bound: int = 0
+    complete: bool = True
+
+    @property
+    def gap(self):
+        """Relative distance between the packed quantity and the proven upper bound."""
+        return (self.upper_bound - self.max_quantity) / self.upper_bound if self.upper_bound else 0.0
+
+    @property
+    def sku_weight(self):
+        return self.original_dims[3]
+
+    @property
+    def total_weight(self):
+        return self.max_quantity * self.sku_weight + self.pallet_dims[3]
+
+    @property
+    def item_volume(self):
+        return float(np.prod(self.placements[:, 3:], axis=1, dtype=np.float64).sum())
+
+# Function to determine orientation description
+def get_orientation_description(original_dims, current_dims):
+    orig_w, orig_d, orig_h = original_dims[:3]
+    curr_w, curr_d, curr_h = current_dims
+
+    if (orig_w, orig_d, orig_h) == (curr_w, curr_d, curr_h):
+        return "Standard (W×D×H)"
+    elif (orig_d, orig_w, orig_h) == (curr_w, curr_d, curr_h):
+        return "Rotated 90° (D×W×H)"
+    elif (orig_w, orig_h, orig_d) == (curr_w, curr_d, curr_h):
+        return "On Side (W×H×D)"
+    elif (orig_d, orig_h, orig_w) == (curr_w, curr_d, curr_h):
+        return "On Side (D×H×W)"
+    elif (orig_h, orig_w, orig_d) == (curr_w, curr_d, curr_h):
+        return "Standing (H×W×D)"
+    elif (orig_h, orig_d, orig_w) == (curr_w, curr_d, curr_h):
+        return "Standing (H×D×W)"
+    else:
+        return "Custom Orientation"
+
+# Function to calculate pallet position (95% of location, centered)
+def calculate_pallet_position(loc_w, loc_d, pallet_w, pallet_d):
+    scale_factor = 0.95
+    available_w = loc_w * scale_factor
+    available_d = loc_d * scale_factor
+
+    final_pallet_w = min(pallet_w, available_w)
+    final_pallet_d = min(pallet_d, available_d)
+
+    offset_x = (loc_w - final_pallet_w) / 2
+    offset_y = (loc_d - final_pallet_d) / 2
+
+    return final_pallet_w, final_pallet_d, offset_x, offset_y
+
+# Function to derive the usable packing space on a pallet inside a location
+def prepare_pallet_space(loc_dims, loc_max_weight, pallet_dims):
+    loc_w, loc_d, loc_h = loc_dims
+
+    actual_pallet_w, actual_pallet_d, offset_x, offset_y = calculate_pallet_position(
+        loc_w, loc_d, pallet_dims[0], pallet_dims[1]
+    )
+
+    available_height = loc_h - pallet_dims[2]
+    available_weight = loc_max_weight - pallet_dims[3]
+
+    updated_pallet_dims = (actual_pallet_w, actual_pallet_d, pallet_dims[2], pallet_dims[3])
+
+    return updated_pallet_dims, (offset_x, offset_y), available_height, available_weight
+
+# Function to list the 6 main orientations of a SKU
+def get_orientations(sku_dims):
+    sku_w, sku_d, sku_h = sku_dims[:3]
+    return [
+        (sku_w, sku_d, sku_h),  # Original
+        (sku_d, sku_w, sku_h),  # Rotated 90°
+        (sku_w, sku_h, sku_d),  # On side (width-height base)
+        (sku_d, sku_h, sku_w),  # On side (depth-height base)
+        (sku_h, sku_w, sku_d),  # Standing (height-width base)
+        (sku_h, sku_d, sku_w)   # Standing (height-depth base)
+    ]
+
+# Function to estimate the maximum possible quantity for one orientation
+def estimate_orientation_quantity(orientation, sku_weight, pallet_dims, available_height, max_weight):
+    w, d, h = orientation
+    layers_possible = int(available_height / h)
+    items_per_layer = int((pallet_dims[0] / w)) * int((pallet_dims[1] / d))
+    return min(layers_possible * items_per_layer, int(max_weight / sku_weight), MAX_SEARCH_QUANTITY)
+
+# Enhanced packing function with better orientation support
+def find_max_quantity_with_orientations(sku_dims, pallet_dims, available_height, max_weight, deadline=None):
+    pallet_w, pallet_d = pallet_dims[0], pallet_dims[1]
+    sku_weight = sku_dims[3]
+
+    best_result = None
+    best_quantity = 0
+    complete = True
+    cost_model = {'seconds_per_unit3': PY3DBP_PROBE_COST}
+
+    # Most promising orientations first, so a deadline cuts off the least useful searches
+    candidates = []
+    for orientation in get_orientations(sku_dims):
+        w, d, h = orientation
+        # Quick feasibility check
+        if w <= pallet_w and d <= pallet_d and h <= available_height:
+            max_estimate = estimate_orientation_quantity(orientation, sku_weight, pallet_dims, available_height, max_weight)
+            if max_estimate > 0:
+                candidates.append((orientation, max_estimate))
+    candidates.sort(key=lambda candidate: candidate[1], reverse=True)
+
+    for orientation, max_estimate in candidates:
+        if max_estimate <= best_quantity:
+            continue
+        if deadline is not None and time.time() >= deadline:
+            complete = False
+            break
+
+        # Binary search for this orientation
+        w, d, h = orientation
+        quantity, placements, searched = binary_search_quantity(
+            (w, d, h, sku_weight), pallet_dims, available_height, max_weight, max_estimate, deadline, cost_model
+        )
+        complete = complete and searched
+        if quantity > best_quantity:
+            best_quantity = quantity
+            best_result = {
+                'quantity': quantity,
+                'orientation': orientation,
+                'original_dims': sku_dims,
+                'placements': placements
+            }
+
+    if best_result:
+        best_result['complete'] = complete
+    return best_result
+
+# Binary search on the quantity for one orientation; returns (quantity, placements, complete)
+def binary_search_quantity(sku_dims, pallet_dims, available_height, max_weight, max_estimate, deadline=None, cost_model=None):
+    """Probes cannot be interrupted, so under a deadline each probe is capped to the largest
+    quantity the cost model predicts will finish in the remaining time."""
+    cost_model = cost_model if cost_model is not None else {'seconds_per_unit3': PY3DBP_PROBE_COST}
+    low, high = 1, max_estimate
+    best_quantity, best_placements = 0, None
+    complete = True
+
+    while low <= high:
+        mid = (low + high) // 2
+        if deadline is not None:
+            remaining = deadline - time.time()
+            affordable = int((max(remaining, 0) / cost_model['seconds_per_unit3']) ** (1 / 3))
+            if affordable < mid:
+                complete = False
+                high = min(high, affordable)
+                if high < low:
+                    break
+                mid = (low + high) // 2
+
+        started = time.time()
+        placements = test_packing_orientation(sku_dims, mid, pallet_dims, available_height, max_weight)
+        elapsed = time.time() - started
+        cost_model['seconds_per_unit3'] = max(cost_model['seconds_per_unit3'], elapsed / mid ** 3)
+
+        if placements is not None:
+            best_quantity, best_placements = mid, placements
+            low = mid + 1
+        else:
+            high = mid - 1
+
+    return best_quantity, best_placements, complete
+
+# Function to pack quantity units in one orientation; returns their placements if all fit, else None
+def test_packing_orientation(sku_dims, quantity, pallet_dims, available_height, max_weight):
+    packer = Packer()
+    sku_w, sku_d, sku_h, sku_weight = sku_dims
+    pallet_w, pallet_d = pallet_dims[0], pallet_dims[1]
+
+    bin = Bin("TestBin", pallet_w, pallet_d, available_height, max_weight)
+    packer.add_bin(bin)
+
+    for i in range(quantity):
+        item = Item(f"test_{i}", sku_w, sku_d, sku_h, sku_weight)
+        packer.add_item(item)
+
+    packer.pack(bigger_first=True, distribute_items=True)
+    if not packer.bins or len(packer.bins[0].items) != quantity:
+        return None
+
+    # Keep only positions and sizes; the Bin and its Decimal-valued Items are dropped here
+    return np.array(
+        [[float(v) for v in item.position] + [float(v) for v in item.get_dimension()] for item in packer.bins[0].items],
+        dtype=PLACEMENT_DTYPE
+    ).reshape(-1, 6)
+
+# Function to fit a grid of footprints into a rectangular area
+def grid_fit(w, d, area_w, area_d):
+    if w <= 0 or d <= 0 or w > area_w + EPSILON or d > area_d + EPSILON:
+        return 0, 0
+    return int(area_w / w + EPSILON), int(area_d / d + EPSILON)
+
+# Function to lay out a cols × rows grid of (w, d) footprints from (x0, y0), row by row
+def grid_footprints(x0, y0, w, d, cols, rows):
+    footprints = np.empty((rows * cols, 4))
+    footprints[:, 0] = x0 + np.tile(np.arange(cols), rows) * w
+    footprints[:, 1] = y0 + np.repeat(np.arange(rows), cols) * d
+    footprints[:, 2:] = (w, d)
+    return footprints
+
+# Function to find the best plain grid (either footprint rotation) for one layer
+def find_grid_pattern(base_w, base_d, pallet_w, pallet_d, deadline=None):
+    best_count, best_footprints = 0, grid_footprints(0, 0, base_w, base_d, 0, 0)
+    for w, d in [(base_w, base_d), (base_d, base_w)]:
+        cols, rows = grid_fit(w, d, pallet_w, pallet_d)
+        if cols * rows > best_count:
+            best_count = cols * rows
+            best_footprints = grid_footprints(0, 0, w, d, cols, rows)
+    return best_count, best_footprints
+
+# Function to find the best footprint pattern for one layer
+def find_footprint_pattern(base_w, base_d, pallet_w, pallet_d, deadline=None):
+    """Best of the plain grids and two-block patterns, where a grid of one footprint
+    rotation leaves a strip that is filled with the other rotation."""
+    best_count, best_blocks = 0, []
+
+    for w, d in [(base_w, base_d), (base_d, base_w)]:
+        cols, rows = grid_fit(w, d, pallet_w, pallet_d)
+
+        # Split across the width: i columns of (w, d), rotated grid in the remaining strip
+        for i in range(cols + 1):
+            strip_cols, strip_rows = grid_fit(d, w, pallet_w - i * w, pallet_d)
+            blocks = [(0, 0, w, d, i, rows), (i * w, 0, d, w, strip_cols, strip_rows)]
+            count = i * rows + strip_cols * strip_rows
+            if count > best_count:
+                best_count, best_blocks = count, blocks
+
+        # Split across the depth: j rows of (w, d), rotated grid in the remaining strip
+        for j in range(rows + 1):
+            strip_cols, strip_rows = grid_fit(d, w, pallet_w, pallet_d - j * d)
+            blocks = [(0, 0, w, d, cols, j), (0, j * d, d, w, strip_cols, strip_rows)]
+            count = cols * j + strip_cols * strip_rows
+            if count > best_count:
+                best_count, best_blocks = count, blocks
+
+    footprints = np.concatenate(
+        [grid_footprints(*block) for block in best_blocks] or [grid_footprints(0, 0, base_w, base_d, 0, 0)]
+    )
+    return best_count, footprints
+
+# Function to list every length reachable as a combination of item sizes (normal patterns)
+def normal_lengths(sizes, limit):
+    a, b = sizes
+    lengths = [
+        i * a + np.arange(int((limit - i * a) / b + EPSILON) + 1) * b
+        for i in range(int(limit / a + EPSILON) + 1)
+    ]
+    return np.unique(np.round(np.concatenate(lengths), 6)).tolist()
+
+# Function to find the best guillotine footprint pattern for one layer (recursive cuts, DP over normal lengths)
+def find_guillotine_pattern(base_w, base_d, pallet_w, pallet_d, deadline=None):
+    """Returns None if the deadline passes before the DP finishes."""
+    xs = normal_lengths((base_w, base_d), pallet_w)
+    ys = normal_lengths((base_w, base_d), pallet_d)
+
+    # best[i][j]: units in an xs[i] × ys[j] rectangle; how[i][j]: grid rotation or cut that achieves it
+    best = [[0] * len(ys) for _ in xs]
+    how = [[None] * len(ys) for _ in xs]
+    for i in range(1, len(xs)):
+        if deadline is not None and time.time() >= deadline:
+            return None
+        x = xs[i]
+        for j in range(1, len(ys)):
+            y = ys[j]
+            value, choice = 0, None
+            for w, d in [(base_w, base_d), (base_d, base_w)]:
+                cols, rows = grid_fit(w, d, x, y)
+                if cols * rows > value:
+                    value, choice = cols * rows, ('grid', w, d, cols, rows)
+
+            # Vertical cuts: the remainder snaps down to the largest normal length that fits
+            for i1 in range(1, i):
+                if xs[i1] > x / 2 + EPSILON:
+                    break
+                i2 = bisect.bisect_right(xs, x - xs[i1] + EPSILON) - 1
+                if best[i1][j] + best[i2][j] > value:
+                    value, choice = best[i1][j] + best[i2][j], ('x', i1, i2)
+
+            # Horizontal cuts
+            for j1 in range(1, j):
+                if ys[j1] > y / 2 + EPSILON:
+                    break
+                j2 = bisect.bisect_right(ys, y - ys[j1] + EPSILON) - 1
+                if best[i][j1] + best[i][j2] > value:
+                    value, choice = best[i][j1] + best[i][j2], ('y', j1, j2)
+
+            best[i][j], how[i][j] = value, choice
+
+    # Expand the chosen cuts into footprints
+    blocks = []
+    stack = [(len(xs) - 1, len(ys) - 1, 0.0, 0.0)]
+    while stack:
+        i, j, ox, oy = stack.pop()
+        choice = how[i][j]
+        if choice is None:
+            continue
+        if choice[0] == 'grid':
+            _, w, d, cols, rows = choice
+            blocks.append(grid_footprints(ox, oy, w, d, cols, rows))
+        elif choice[0] == 'x':
+            stack.append((choice[1], j, ox, oy))
+            stack.append((choice[2], j, ox + xs[choice[1]], oy))
+        else:
+            stack.append((i, choice[1], ox, oy))
+            stack.append((i, choice[2], ox, oy + ys[choice[1]]))
+
+    footprints = np.concatenate(blocks) if blocks else grid_footprints(0, 0, base_w, base_d, 0, 0)
+    return best[-1][-1], footprints
+
+# Footprint pattern finders in increasing cost (and quality) order for the anytime layered search
+FOOTPRINT_PATTERN_STAGES = [find_grid_pattern, find_footprint_pattern, find_guillotine_pattern]
+
+# Function to list the distinct layer types of a SKU (one per height, footprint free to rotate);
+# returns None if the pattern finder runs out of time
+def get_layer_types(sku_dims, pallet_dims, available_height, find_pattern=find_footprint_pattern, deadline=None):
+    sku_w, sku_d, sku_h = sku_dims[:3]
+    layer_types = []
+    seen = set()
+
+    for w, d, h in [(sku_w, sku_d, sku_h), (sku_w, sku_h, sku_d), (sku_d, sku_h, sku_w)]:
+        key = (h, min(w, d), max(w, d))
+        if key in seen or h > available_height + EPSILON:
+            continue
+        seen.add(key)
+
+        pattern = find_pattern(w, d, pallet_dims[0], pallet_dims[1], deadline)
+        if pattern is None:
+            return None
+
+        count, footprints = pattern
+        if count > 0:
+            layer_types.append({
+                'orientation': (float(footprints[0, 2]), float(footprints[0, 3]), h),
+                'height': h,
+                'count': count,
+                'footprints': footprints
+            })
+
+    return layer_types
+
+# Function to choose the stack of layer heights maximizing the unit count (unbounded knapsack)
+def compose_layers(heights, counts, available_height):
+    """Exact over the real heights: at most three layer types matter (the best count per distinct
+    height), so enumerate the tallest, vectorize the middle one and fill up with the shortest."""
+    best_of_height = {}
+    for idx, (h, count) in enumerate(zip(heights, counts)):
+        key = round(h, 6)
+        if h <= available_height + EPSILON and count > 0 and (key not in best_of_height or count > counts[best_of_height[key]]):
+            best_of_height[key] = idx
+    types = sorted(best_of_height.values(), key=lambda idx: heights[idx], reverse=True)
+    if not types:
+        return 0, []
+
+    # Layer counts per type for every combination of the types before the last two
+    def layers_fitting(h, room):
+        return int(max(room, 0) / h + EPSILON)
+
+    outer, (middle, last) = types[:-2], ([None] + types)[-2:]
+    best_total, best_layers = -1, None
+    outer_ranges = [range(layers_fitting(heights[idx], available_height) + 1) for idx in outer]
+    for outer_layers in itertools.product(*outer_ranges):
+        room = available_height - sum(n * heights[idx] for n, idx in zip(outer_layers, outer))
+        if room < -EPSILON:
+            continue
+        base = sum(n * counts[idx] for n, idx in zip(outer_layers, outer))
+
+        middle_layers = np.arange(layers_fitting(heights[middle], room) + 1) if middle is not None else np.zeros(1, dtype=int)
+        middle_height = heights[middle] if middle is not None else 0.0
+        middle_count = counts[middle] if middle is not None else 0
+        last_layers = np.floor(np.maximum(room - middle_layers * middle_height, 0) / heights[last] + EPSILON).astype(int)
+
+        totals = base + middle_layers * middle_count + last_layers * counts[last]
+        pick = int(np.argmax(totals))
+        if totals[pick] > best_total:
+            best_total = int(totals[pick])
+            best_layers = list(zip(outer, outer_layers)) + [(middle, int(middle_layers[pick])), (last, int(last_layers[pick]))]
+
+    sequence = [idx for idx, n in best_layers if idx is not None for _ in range(n)]
+    return best_total, sequence
+
+# Function to find the largest length <= limit reachable as a combination of the item sizes
+def reduced_length(sizes, limit):
+    a, b, c = sorted(sizes, reverse=True)
+    best = 0.0
+    for i in range(int(limit / a + EPSILON) + 1):
+        used = i * a + np.arange(int((limit - i * a) / b + EPSILON) + 1) * b
+        best = max(best, float((used + np.floor((limit - used) / c + EPSILON) * c).max()))
+    return best
+
+# Function to compute an upper bound valid for any packing of the SKU (not just the engines here)
+def proven_upper_bound(sku_dims, pallet_dims, available_height, max_weight):
+    """Volume bound on the pallet space reduced to normal-pattern lengths: every packing can be
+    pushed to the origin so that each coordinate is a combination of the SKU dimensions."""
+    sku_w, sku_d, sku_h, sku_weight = sku_dims
+    pallet_w, pallet_d = pallet_dims[0], pallet_dims[1]
+
+    if available_height <= 0 or max_weight <= 0:
+        return 0
+    if not any(w <= pallet_w + EPSILON and d <= pallet_d + EPSILON and h <= available_height + EPSILON
+               for w, d, h in get_orientations(sku_dims)):
+        return 0
+
+    sizes = (sku_w, sku_d, sku_h)
+    reduced_volume = reduced_length(sizes, pallet_w) * reduced_length(sizes, pallet_d) * reduced_length(sizes, available_height)
+    volume_bound = int(reduced_volume / (sku_w * sku_d * sku_h) + EPSILON)
+
+    return min(volume_bound, int(max_weight / sku_weight + EPSILON))
+
+# Function to stack the layers picked by compose_layers into explicit placements
+def pack_layer_types(layer_types, sku_dims, available_height, max_weight):
+    _, sequence = compose_layers(
+        [t['height'] for t in layer_types], [t['count'] for t in layer_types], available_height
+    )
+
+    # Widest layers at the bottom, then trim from the top to respect the weight cap
+    layers = sorted((layer_types[idx] for idx in sequence), key=lambda t: t['count'], reverse=True)
+    remaining = int(max_weight / sku_dims[3] + EPSILON)
+
+    # Each layer is its footprints (x, y, w, d) lifted to z with height h, written straight into the array
+    counts = []
+    for layer in layers:
+        counts.append(min(layer['count'], remaining))
+        remaining -= counts[-1]
+        if remaining <= 0:
+            break
+    quantity = sum(counts)
+    if quantity <= 0:
+        return None
+
+    placements = np.empty((quantity, 6), dtype=PLACEMENT_DTYPE)
+    start, z = 0, 0.0
+    for layer, count in zip(layers, counts):
+        rows = placements[start:start + count]
+        rows[:, [0, 1, 3, 4]] = layer['footprints'][:count]
+        rows[:, 2] = z
+        rows[:, 5] = layer['height']
+        start += count
+        z += layer['height']
+
+    # The bottom layer's orientation; upper layers may differ (see analyze_packing_layers)
+    return {
+        'quantity': quantity,
+        'orientation': layers[0]['orientation'],
+        'original_dims': sku_dims,
+        'placements': placements
+    }
+
+# Layer composition packing: a different orientation per layer chosen by an exact knapsack. Anytime: footprint
+# patterns get richer stage by stage until the deadline passes or the proven upper bound is reached.
+def find_max_quantity_layered(sku_dims, pallet_dims, available_height, max_weight, deadline=None):
+    if available_height <= 0 or max_weight <= 0:
+        return None
+
+    upper_bound = proven_upper_bound(sku_dims, pallet_dims, available_height, max_weight)
+    best_result = None
+    complete = True
+
+    for find_pattern in FOOTPRINT_PATTERN_STAGES:
+        if best_result is not None:
+            if best_result['quantity'] >= upper_bound:
+                break
+            if deadline is not None and time.time() >= deadline:
+                complete = False
+                break
+
+        layer_types = get_layer_types(sku_dims, pallet_dims, available_height, find_pattern, deadline)
+        if layer_types is None:
+            complete = False
+            break
+
+        result = pack_layer_types(layer_types, sku_dims, available_height, max_weight)
+        if result and (best_result is None or result['quantity'] > best_result['quantity']):
+            best_result = result
+
+    if best_result:
+        best_result['complete'] = complete
+    return best_result
+
+# Function to map a (possibly float32) placement size back to the exact SKU orientation
+def match_orientation(original_dims, dims):
+    for orientation in get_orientations(original_dims):
+        if all(abs(a - b) < 1e-3 for a, b in zip(orientation, dims)):
+            return orientation
+    return tuple(float(dim) for dim in dims)
+
+# Enhanced function to analyze layers and orientations
+def analyze_packing_layers(placements, pallet_h, original_dims):
+    if placements is None or len(placements) == 0:
+        return []
+
+    # Group items by Z position (layers), rounded to nearest 0.1 inch
+    layer_keys = np.round(placements[:, 2].astype(np.float64), 1)
+
+    # Analyze each layer
+    layer_analysis = []
+    for z_pos in np.unique(layer_keys):
+        items_in_layer = placements[layer_keys == z_pos]
+        layer_height = pallet_h + float(z_pos)
+
+        # Get orientations for items in this layer (layer patterns may mix two rotations)
+        dims_rows, counts = np.unique(items_in_layer[:, 3:], axis=0, return_counts=True)
+        orientation_counts = {
+            match_orientation(original_dims, dims): int(count) for dims, count in zip(dims_rows, counts)
+        }
+
+        w, d, h = match_orientation(original_dims, items_in_layer[0, 3:])
+        orientation_desc = get_orientation_description(original_dims, (w, d, h))
+        if len(orientation_counts) == 1:
+            arrangement = f"{len(items_in_layer)} items in {orientation_desc.lower()} position"
+        else:
+            orientation_desc = "Mixed"
+            arrangement = " + ".join(
+                f"{count} items in {get_orientation_description(original_dims, dims).lower()} position"
+                for dims, count in orientation_counts.items()
+            )
+
+        layer_analysis.append({
+            'layer_number': len(layer_analysis) + 1,
+            'z_position': layer_height,
+            'item_count': len(items_in_layer),
+            'dimensions': f"{w:.1f}×{d:.1f}×{h:.1f}",
+            'orientation': orientation_desc,
+            'arrangement': arrangement
+        })
+
+    return layer_analysis
+
+# Function to build the compact result for a SKU from its best packing
+def build_packing_result(sku_name, sku_weight, best_result, pallet_dims, pallet_offset, available_height, available_weight):
+    # Both engines keep the placements of their best packing, so no final re-pack is needed
+    placements = np.asarray(best_result['placements'], dtype=PLACEMENT_DTYPE).reshape(-1, 6)
+    placements.setflags(write=False)
+
+    return PackingResult(
+        sku_name=sku_name,
+        max_quantity=int(best_result['quantity']),
+        upper_bound=int(max(best_result.get('upper_bound', 0), best_result['quantity'])),
+        complete=best_result.get('complete', True),
+        best_orientation=tuple(float(dim) for dim in best_result['orientation']),
+        original_dims=tuple(float(dim) for dim in best_result['original_dims'][:3]) + (float(sku_weight),),
+        pallet_dims=tuple(float(dim) for dim in pallet_dims),
+        pallet_offset=tuple(float(offset) for offset in pallet_offset),
+        placements=placements
+    )
+
+# Function to solve one packing problem in a prepared pallet space (picklable, so it can run in a worker).
+# The result carries no SKU name, so identical problems from differently labelled SKUs can share one job.
+# With a time budget the search stops improving once the budget is spent and the result is flagged
+# incomplete; the layered engine always finishes its grid stage, and laying out very large packings
+# is not interrupted, so those can run past the budget.
+def solve_problem(sku_dims, pallet_space, engine="layered", time_budget_ms=None):
+    deadline = time.time() + time_budget_ms / 1000 if time_budget_ms else None
+    pallet_dims, pallet_offset, available_height, available_weight = pallet_space
+    best_result = ENGINE_SOLVERS[engine](sku_dims, pallet_dims, available_height, available_weight, deadline)
+
+    if best_result and best_result['quantity'] > 0:
+        best_result['upper_bound'] = proven_upper_bound(sku_dims, pallet_dims, available_height, available_weight)
+        return build_packing_result(
+            "", sku_dims[3], best_result,
+            pallet_dims, pallet_offset, available_height, available_weight
+        )
+    return None
+
+# Function to label a solved problem with the SKU it was solved for. The read-only flag on the
+# placements is not pickled, so it is set again on results received from a worker process.
+def name_result(result, sku_name):
+    if result is None:
+        return None
+    result.placements.setflags(write=False)
+    return result._replace(sku_name=sku_name)
+
+# Function to solve one SKU in a prepared pallet space
+def solve_sku(sku_name, sku_dims, pallet_space, engine="layered", time_budget_ms=None):
+    return name_result(solve_problem(sku_dims, pallet_space, engine, time_budget_ms), sku_name)
+
+# Function to solve every SKU, yielding (row position, result) as each one finishes;
+# with an executor at most max_in_flight jobs are submitted at a time
+def iter_solve_skus(skus, loc_dims, loc_max_weight, pallet_dims, engine="layered", executor=None,
+                    time_budget_ms=None, max_in_flight=None):
+    pallet_space = prepare_pallet_space(loc_dims, loc_max_weight, pallet_dims)
+
+    problems = [
+        (sku['name'], ((sku['width'], sku['depth'], sku['height'], sku['weight']), pallet_space, engine, time_budget_ms))
+        for _, sku in skus.iterrows()
+    ]
+    if executor is None:
+        for position, (sku_name, problem) in enumerate(problems):
+            yield position, name_result(solve_problem(*problem), sku_name)
+        return
+
+    max_in_flight = max_in_flight or getattr(executor, 'max_in_flight', None) or os.cpu_count() or 1
+    queue = deque(enumerate(problems))
+    problem_futures = {}  # problem -> future, so SKUs with identical dimensions share one solve
+    in_flight = {}  # future -> (row position, SKU name) pairs waiting on it
+
+    while queue or in_flight:
+        while queue and len(in_flight) < max_in_flight:
+            position, (sku_name, problem) = queue.popleft()
+            future = problem_futures.get(problem)
+            if future is None:
+                future = problem_futures[problem] = executor.submit(solve_problem, *problem)
+            in_flight.setdefault(future, []).append((position, sku_name))
+
+        done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+        for future in done:
+            result = future.result()
+            for position, sku_name in in_flight.pop(future):
+                yield position, name_result(result, sku_name)
+
+# Main packing function
+def pack_skus_max(skus, loc_dims, loc_max_weight, pallet_dims, engine="layered", executor=None, time_budget_ms=None):
+    solved = dict(iter_solve_skus(skus, loc_dims, loc_max_weight, pallet_dims, engine, executor, time_budget_ms))
+
+    return [solved[position] for position in range(len(solved)) if solved[position] is not None]
+
+# Solver behind each packing engine
+ENGINE_SOLVERS = {
+    "layered": find_max_quantity_layered,
+    "py3dbp": find_max_quantity_with_orientations,
+}
+
+# Function to score a packed quantity under one of the ranking metrics
+def score_configuration(quantity, sku_dims, loc_spec, pallet_space, metric="units"):
+    loc_w, loc_d, loc_h, _ = loc_spec
+    pallet_dims, available_height = pallet_space[0], pallet_space[2]
+    item_vol = sku_dims[0] * sku_dims[1] * sku_dims[2]
+
+    if metric == "units":
+        return float(quantity)
+    elif metric == "utilization":
+        pallet_vol = pallet_dims[0] * pallet_dims[1] * available_height
+        return quantity * item_vol / pallet_vol if pallet_vol > 0 else 0.0
+    elif metric == "cubic_efficiency":
+        loc_vol = loc_w * loc_d * loc_h
+        return quantity * item_vol / loc_vol if loc_vol > 0 else 0.0
+    else:
+        raise ValueError(f"Unknown ranking metric: {metric}")
+
+# Function to compute a cheap upper bound on the quantity an engine can fit in a pallet space
+def quantity_upper_bound(sku_dims, pallet_space, engine="layered"):
+    pallet_dims, _, available_height, available_weight = pallet_space
+    pallet_w, pallet_d = pallet_dims[0], pallet_dims[1]
+
+    if available_height <= 0 or available_weight <= 0:
+        return 0
+
+    if engine == "py3dbp":
+        # The search never goes past the per-orientation estimate, so the best estimate bounds the result
+        estimates = [
+            estimate_orientation_quantity(orientation, sku_dims[3], pallet_dims, available_height, available_weight)
+            for orientation in get_orientations(sku_dims)
+            if orientation[0] <= pallet_w and orientation[1] <= pallet_d and orientation[2] <= available_height
+        ]
+        return max(estimates, default=0)
+
+    # Layer composition with every layer relaxed to its area bound
+    heights, counts = [], []
+    for w, d, h in get_orientations(sku_dims):
+        if max(grid_fit(w, d, pallet_w, pallet_d)[0], grid_fit(d, w, pallet_w, pallet_d)[0]) > 0:
+            heights.append(h)
+            counts.append(int(pallet_w * pallet_d / (w * d) + EPSILON))
+    if not heights:
+        return 0
+
+    layer_bound, _ = compose_layers(heights, counts, available_height)
+    return min(layer_bound, proven_upper_bound(sku_dims, pallet_dims, available_height, available_weight))
+
+# Function to rank every location/pallet combination for each SKU
+def rank_configurations(skus, locations, pallets, metric="units", top_n=3, executor=None, max_in_flight=None,
+                        engine="layered", time_budget_ms=None):
+    """Evaluate LOCATION_TYPES × PALLET_TYPES for each SKU, pruning combinations whose
+    upper bound cannot reach the current top_n and running the survivors concurrently."""
+    if metric not in RANKING_METRICS:
+        raise ValueError(f"Unknown ranking metric: {metric}")
+
+    if executor is None:
+        with ProcessPoolExecutor() as pool:
+            return rank_configurations(skus, locations, pallets, metric, top_n, pool, max_in_flight, engine, time_budget_ms)
+
+    max_in_flight = max_in_flight or getattr(executor, 'max_in_flight', None) or os.cpu_count() or 1
+
+    # Build every candidate with its bound
+    rows = []
+    for _, sku in skus.iterrows():
+        sku_dims = (sku['width'], sku['depth'], sku['height'], sku['weight'])
+        for loc_name, loc_spec in locations.items():
+            for pallet_name, pallet_dims in pallets.items():
+                pallet_space = prepare_pallet_space(loc_spec[:3], loc_spec[3], pallet_dims)
+                bound = quantity_upper_bound(sku_dims, pallet_space, engine)
+                rows.append({
+                    'sku_name': sku['name'],
+                    'sku_weight': sku['weight'],
+                    'sku_dims': sku_dims,
+                    'location': loc_name,
+                    'pallet': pallet_name,
+                    'pallet_space': pallet_space,
+                    'upper_bound': bound,
+                    'bound_score': score_configuration(bound, sku_dims, loc_spec, pallet_space, metric),
+                    'quantity': None,
+                    'score': None,
+                    'result': None,
+                    'status': 'infeasible' if bound == 0 else 'pending'
+                })
+
+    # Most promising candidates first so the top_n fills quickly
+    pending = sorted((row for row in rows if row['status'] == 'pending'),
+                     key=lambda row: row['bound_score'], reverse=True)
+    top_scores = {}  # sku_name -> sorted list of the best scores so far
+
+    def threshold(sku_name):
+        scores = top_scores.get(sku_name, [])
+        return scores[top_n - 1] if len(scores) >= top_n else -1.0
+
+    # Identical problems (same SKU dimensions and pallet space) are solved once
+    problem_futures = {}
+    in_flight = {}
+    queue = deque(pending)
+
+    while queue or in_flight:
+        while queue and len(in_flight) < max_in_flight:
+            row = queue.popleft()
+            if row['bound_score'] <= threshold(row['sku_name']):
+                row['status'] = 'pruned'
+                continue
+            key = (row['sku_dims'], row['pallet_space'])
+            if key not in problem_futures:
+                problem_futures[key] = executor.submit(solve_problem, *key, engine, time_budget_ms)
+            in_flight.setdefault(problem_futures[key], []).append(row)
+
+        if not in_flight:
+            break
+
+        done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+        for future in done:
+            result = future.result()
+            for row in in_flight.pop(future):
+                quantity = result.max_quantity if result else 0
+                row['quantity'] = quantity
+                row['result'] = name_result(result, row['sku_name'])
+                row['status'] = 'evaluated'
+                loc_spec = locations[row['location']]
+                row['score'] = score_configuration(quantity, row['sku_dims'], loc_spec, row['pallet_space'], metric)
+                scores = top_scores.setdefault(row['sku_name'], [])
+                scores.append(row['score'])
+                scores.sort(reverse=True)
+
+    # Evaluated combinations by score, then pruned/infeasible ones by bound
+    ranking = []
+    for sku_name in dict.fromkeys(row['sku_name'] for row in rows):
+        sku_rows = [row for row in rows if row['sku_name'] == sku_name]
+        sku_rows.sort(key=lambda row: (row['status'] == 'evaluated', row['score'] or 0, row['bound_score']), reverse=True)
+        for rank, row in enumerate(sku_rows, start=1):
+            row['rank'] = rank
+            ranking.append(row)
+
+    return ranking
@@ -0,0 +1,146 @@
+# Imports
+import numpy as np
+import pandas as pd
+
+# Columns expected in a pick-event stream
+PICK_EVENT_COLUMNS = ['timestamp', 'sku', 'quantity']
+
+# Function to generate synthetic pick events (Poisson picks per day, spread over a working shift)
+def generate_pick_events(sku_names, days=365, daily_picks=10.0, pick_quantity=2.0,
+                         start="2025-01-01", shift_hours=(6, 22), seed=None):
+    """daily_picks and pick_quantity are means, either scalars or one value per SKU."""
+    rng = np.random.default_rng(seed)
+    sku_names = np.asarray(sku_names)
+    daily_picks = np.broadcast_to(np.asarray(daily_picks, dtype=float), sku_names.shape)
+    pick_quantity = np.broadcast_to(np.asarray(pick_quantity, dtype=float), sku_names.shape)
+
+    # Number of picks for every SKU on every day, then one row per pick
+    counts = rng.poisson(daily_picks[:, None], size=(len(sku_names), days))
+    sku_index = np.repeat(np.repeat(np.arange(len(sku_names)), days), counts.ravel())
+    day_index = np.repeat(np.tile(np.arange(days), len(sku_names)), counts.ravel())
+
+    shift_start, shift_end = shift_hours
+    seconds = (day_index * 24 + shift_start) * 3600 + rng.uniform(0, (shift_end - shift_start) * 3600, len(sku_index))
+    quantities = 1 + rng.poisson(np.maximum(pick_quantity[sku_index] - 1, 0))
+    order = np.argsort(seconds)
+
+    return pd.DataFrame({
+        'timestamp': np.datetime64(pd.Timestamp(start), 'ns') + (seconds[order] * 1e9).astype('timedelta64[ns]'),
+        'sku': pd.Categorical.from_codes(sku_index[order], categories=sku_names),
+        'quantity': quantities[order]
+    })
+
+# Function to load and validate a pick-event stream from a CSV path, file object or DataFrame
+def load_pick_events(source):
+    events = source if isinstance(source, pd.DataFrame) else pd.read_csv(source)
+    events = events.rename(columns=lambda column: str(column).strip().lower())
+
+    missing = [column for column in PICK_EVENT_COLUMNS if column not in events.columns]
+    if missing:
+        raise ValueError(f"Pick events are missing columns: {', '.join(missing)}")
+
+    events = pd.DataFrame({
+        'timestamp': pd.to_datetime(events['timestamp'], errors='coerce'),
+        'sku': events['sku'].astype('string').str.strip(),
+        'quantity': pd.to_numeric(events['quantity'], errors='coerce')
+    })
+    valid = events['timestamp'].notna() & events['sku'].notna() & (events['quantity'] >= 0)
+    return events[valid].reset_index(drop=True)
+
+# Discrete-event simulation of pick-face depletion and replenishment
+def simulate_replenishment(events, capacities, reorder_point=0.0, return_trips=False):
+    """Simulate every (SKU, location) row of capacities against that SKU's picks.
+
+    Each location starts full. After a pick, if the level is at or below the reorder point
+    (units, or a 0-1 fraction of capacity when below 1), one replenishment trip tops it back up
+    to capacity. A pick larger than the stock on hand is short-picked by the difference.
+
+    Since the level is back at capacity after every trip, the next trip is the first pick at
+    which consumption since the last trip reaches capacity - reorder point. All lanes advance
+    together with one searchsorted over the cumulative picks, so the loop runs once per trip
+    of the busiest lane rather than once per event.
+    """
+    capacities = pd.DataFrame(capacities).reset_index(drop=True)
+    if 'reorder_point' not in capacities.columns:
+        capacities['reorder_point'] = reorder_point
+    capacity = capacities['capacity'].to_numpy(dtype=float)
+    reorder = capacities['reorder_point'].to_numpy(dtype=float)
+    reorder = np.where(reorder < 1, reorder * capacity, reorder)
+    threshold = capacity - reorder
+
+    # Picks grouped by SKU in time order, with a running total of units picked
+    sku_codes, sku_names = pd.factorize(events['sku'], sort=True)
+    order = np.argsort(events['timestamp'].to_numpy(), kind='stable')
+    # Narrow codes let numpy use a radix sort for the stable regrouping by SKU
+    order = order[np.argsort(sku_codes[order].astype(np.min_scalar_type(len(sku_names))), kind='stable')]
+    codes = sku_codes[order]
+    quantities = events['quantity'].to_numpy(dtype=float)[order]
+    timestamps = events['timestamp'].to_numpy()[order]
+    cumulative = np.concatenate([[0.0], np.cumsum(quantities)])  # cumulative[i] = units before pick i
+
+    # Pick range of every SKU, plus a trailing empty range for SKUs without picks (also when there are no events)
+    segment_start = np.append(np.searchsorted(codes, np.arange(len(sku_names)), side='left'), 0)
+    segment_end = np.append(np.searchsorted(codes, np.arange(len(sku_names)), side='right'), 0)
+
+    # One lane per capacity row; lanes whose SKU has no picks or that cannot hold stock never run
+    lane_sku = pd.Index(sku_names.astype(str)).get_indexer(capacities['sku'].astype(str))
+    has_picks = lane_sku >= 0
+    lane_start = segment_start[lane_sku]  # -1 (no picks) selects the empty range
+    lane_end = segment_end[lane_sku]
+
+    last_trip = cumulative[lane_start]  # units picked (in the global total) at the last refill
+    trips = np.zeros(len(capacities), dtype=np.int64)
+    short_picks = np.zeros(len(capacities), dtype=np.int64)
+    units_short = np.zeros(len(capacities))
+    trip_lanes, trip_events = [], []
+
+    active = np.flatnonzero(has_picks & (capacity > 0) & (threshold > 0))
+    while len(active):
+        # First pick at which consumption since the last refill reaches the trigger level
+        pick = np.searchsorted(cumulative, last_trip[active] + threshold[active], side='left') - 1
+        hit = pick < lane_end[active]
+        active, pick = active[hit], pick[hit]
+
+        consumed = cumulative[pick + 1] - last_trip[active]
+        shortfall = np.maximum(consumed - capacity[active], 0)
+        trips[active] += 1
+        short_picks[active] += shortfall > 0
+        units_short[active] += shortfall
+        last_trip[active] = cumulative[pick + 1]
+
+        if return_trips:
+            trip_lanes.append(active)
+            trip_events.append(pick)
+
+    # Calendar days covered by the stream
+    if len(events):
+        days = (events['timestamp'].max().normalize() - events['timestamp'].min().normalize()).days + 1
+    else:
+        days = 1
+    units_picked = cumulative[lane_end] - cumulative[lane_start]
+
+    summary = pd.DataFrame({
+        'sku': capacities['sku'],
+        'location': capacities['location'] if 'location' in capacities.columns else None,
+        'capacity': capacity.astype(np.int64),
+        'reorder_point': reorder,
+        'picks': lane_end - lane_start,
+        'units_picked': units_picked,
+        'replenishments': trips,
+        'replenishments_per_day': trips / days,
+        'days_between_replenishments': np.where(trips > 0, days / np.maximum(trips, 1), np.nan),
+        'short_picks': short_picks,
+        'units_short': units_short,
+    })
+
+    if not return_trips:
+        return summary
+
+    lanes = np.concatenate(trip_lanes) if trip_lanes else np.array([], dtype=np.int64)
+    picks = np.concatenate(trip_events) if trip_events else np.array([], dtype=np.int64)
+    trip_log = pd.DataFrame({
+        'timestamp': timestamps[picks],
+        'sku': capacities['sku'].to_numpy()[lanes],
+        'location': summary['location'].to_numpy()[lanes],
+    }).sort_values('timestamp', ignore_index=True)
+    return summary, trip_log
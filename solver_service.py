@@ -0,0 +1,244 @@
+# Imports
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+
+# Number of recent jobs kept for the queue-wait and service-time percentiles
+METRICS_WINDOW = 1000
+
+# Longest a session waits (seconds) for one of its own jobs to finish before its submission is rejected
+SESSION_WAIT_TIMEOUT_S = 30
+
+class SolverError(RuntimeError):
+    """Base class for solver problems shown to the user as a warning."""
+
+class SolverBusyError(SolverError):
+    """Raised when the shared solver queue is full."""
+
+class SolverFailedError(SolverError):
+    """Raised from a job's future when the solve itself failed or its worker died."""
+
+# Function to pick the worker start method: forking a multi-threaded server process is unsafe
+def default_mp_context():
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+# Function run in the worker: time the call so the service can split queue wait from service time
+def timed_call(fn, args):
+    started = time.time()
+    result = fn(*args)
+    return started, time.time(), result
+
+class SolverService:
+    """Process-wide solver: one worker pool shared by every session, identical in-flight
+    problems coalesced onto a single job, at most max_per_session running jobs per session
+    (further submissions wait up to session_wait_timeout seconds, then are rejected) and at most
+    max_queue_depth jobs overall (further ones are rejected). Jobs are coalesced on the function
+    and all its arguments, so callers submit problems without caller-specific labels. Optional
+    background work uses try_submit, which never waits, and can be withdrawn with cancel. A failed
+    job raises SolverFailedError; if a worker dies, the broken pool is replaced with a fresh one."""
+
+    def __init__(self, max_workers=None, max_queue_depth=64, max_per_session=None,
+                 session_wait_timeout=SESSION_WAIT_TIMEOUT_S, mp_context=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue_depth = max_queue_depth
+        self.max_per_session = max_per_session or max(1, self.max_workers // 2)
+        self.session_wait_timeout = session_wait_timeout
+        self.mp_context = mp_context or default_mp_context()
+
+        self._executor = ProcessPoolExecutor(self.max_workers, mp_context=self.mp_context)
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+        self._in_flight = {}  # problem key -> {'future', 'job', 'session_id', 'callers', 'finished'}
+        self._session_jobs = {}  # session id -> number of jobs it started that are still running
+        self._queue_waits = deque(maxlen=METRICS_WINDOW)
+        self._service_times = deque(maxlen=METRICS_WINDOW)
+        self._counts = {'submitted': 0, 'coalesced': 0, 'rejected': 0, 'completed': 0, 'failed': 0, 'cancelled': 0,
+                        'pool_restarts': 0}
+
+    # Submit fn(*args) for a session, sharing the job with any identical problem already in flight
+    def submit(self, session_id, fn, *args):
+        return self._submit(session_id, fn, args, block=True)
+
+    # Like submit, but returns None instead of waiting or raising when no slot is free (for optional work)
+    def try_submit(self, session_id, fn, *args):
+        return self._submit(session_id, fn, args, block=False)
+
+    def _submit(self, session_id, fn, args, block):
+        key = (fn.__module__, fn.__qualname__, args)
+
+        with self._lock:
+            job = self._coalesce(key)
+            if job is not None:
+                return job['future']
+
+            # A session over its concurrency limit waits (bounded) for one of its own jobs to finish
+            deadline = time.time() + self.session_wait_timeout
+            while self._session_jobs.get(session_id, 0) >= self.max_per_session:
+                if not block:
+                    return None
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self._slot_freed.wait(remaining):
+                    self._counts['rejected'] += 1
+                    raise SolverBusyError(
+                        f"Your previous {self.max_per_session} solver job(s) are still running. Please try again shortly."
+                    )
+                job = self._coalesce(key)
+                if job is not None:
+                    return job['future']
+
+            if len(self._in_flight) >= self.max_queue_depth:
+                if not block:
+                    return None
+                self._counts['rejected'] += 1
+                raise SolverBusyError(
+                    f"Solver queue is full ({self.max_queue_depth} jobs). Please try again shortly."
+                )
+
+            future = Future()
+            future.set_running_or_notify_cancel()
+            job = {'future': future, 'job': None, 'session_id': session_id, 'callers': 1, 'finished': False}
+            self._in_flight[key] = job
+            self._session_jobs[session_id] = self._session_jobs.get(session_id, 0) + 1
+            self._counts['submitted'] += 1
+
+        submitted = time.time()
+        try:
+            executor = self._executor
+            try:
+                job['job'] = executor.submit(timed_call, fn, args)
+            except BrokenProcessPool:
+                # A worker died since the last job finished; retry once on a fresh pool
+                job['job'] = self._replace_executor(executor).submit(timed_call, fn, args)
+        except Exception:
+            with self._lock:
+                self._in_flight.pop(key, None)
+                self._release_session(session_id)
+            raise
+        job['job'].add_done_callback(
+            lambda pool_job: self._finish(key, session_id, submitted, pool_job, job, executor)
+        )
+        return future
+
+    # Swap in a fresh pool if broken is still the current one; returns the current pool
+    def _replace_executor(self, broken):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = ProcessPoolExecutor(self.max_workers, mp_context=self.mp_context)
+                self._counts['pool_restarts'] += 1
+            executor = self._executor
+        broken.shutdown(wait=False, cancel_futures=True)
+        return executor
+
+    def _coalesce(self, key):
+        job = self._in_flight.get(key)
+        if job is not None:
+            job['callers'] += 1
+            self._counts['coalesced'] += 1
+        return job
+
+    # Withdraw a job this session submitted, if no other caller shares it and no worker has started it;
+    # returns whether it was cancelled (a running job cannot be interrupted and is left to finish)
+    def cancel(self, session_id, future):
+        with self._lock:
+            key, job = next(((key, job) for key, job in self._in_flight.items() if job['future'] is future), (None, None))
+            if job is None or job['job'] is None or job['session_id'] != session_id or job['callers'] > 1:
+                return False
+            # Withdraw it from coalescing first, so no other caller can join a job about to be cancelled
+            del self._in_flight[key]
+
+        # Outside the lock: a successful cancel runs _finish, which takes it
+        if job['job'].cancel():
+            return True
+        with self._lock:
+            # Already picked up by a worker: share it again unless it has finished or an identical job took its place
+            if not job['finished']:
+                self._in_flight.setdefault(key, job)
+        return False
+
+    def _finish(self, key, session_id, submitted, job, entry, executor):
+        future = entry['future']
+        if not job.cancelled() and isinstance(job.exception(), BrokenProcessPool):
+            self._replace_executor(executor)
+
+        with self._lock:
+            entry['finished'] = True
+            # The key may belong to a newer job if this one was withdrawn by cancel
+            if self._in_flight.get(key) is entry:
+                del self._in_flight[key]
+            self._release_session(session_id)
+
+            error = CancelledError() if job.cancelled() else job.exception()
+            if error is None:
+                started, finished, result = job.result()
+                self._queue_waits.append(max(0.0, started - submitted))
+                self._service_times.append(finished - started)
+                self._counts['completed'] += 1
+            else:
+                self._counts['cancelled' if job.cancelled() else 'failed'] += 1
+
+        if error is None:
+            future.set_result(result)
+        elif isinstance(error, CancelledError):
+            future.set_exception(error)
+        else:
+            failure = SolverFailedError(
+                "A solver worker stopped unexpectedly (it may have run out of memory). Please run the optimization again."
+                if isinstance(error, BrokenProcessPool) else
+                f"The solver failed on this problem ({type(error).__name__}: {error}). Please run the optimization again."
+            )
+            failure.__cause__ = error
+            future.set_exception(failure)
+
+    def _release_session(self, session_id):
+        self._session_jobs[session_id] -= 1
+        if not self._session_jobs[session_id]:
+            del self._session_jobs[session_id]
+        self._slot_freed.notify_all()
+
+    # Executor-like view for one session, usable wherever an executor with submit(fn, *args) is expected
+    def session_executor(self, session_id):
+        return SessionExecutor(self, session_id)
+
+    # Snapshot of the service counters and latency percentiles (milliseconds)
+    def metrics(self):
+        with self._lock:
+            queue_waits = np.array(self._queue_waits) * 1000
+            service_times = np.array(self._service_times) * 1000
+            metrics = dict(self._counts)
+            metrics['in_flight'] = len(self._in_flight)
+            metrics['active_sessions'] = len(self._session_jobs)
+
+        for name, values in [('queue_wait_ms', queue_waits), ('service_time_ms', service_times)]:
+            for pct in (50, 95):
+                metrics[f'{name}_p{pct}'] = float(np.percentile(values, pct)) if len(values) else 0.0
+
+        return metrics
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+class SessionExecutor:
+    """Routes submit(fn, *args) through the shared service on behalf of one session."""
+
+    def __init__(self, service, session_id):
+        self.service = service
+        self.session_id = session_id
+
+    @property
+    def max_in_flight(self):
+        return self.service.max_per_session
+
+    def submit(self, fn, *args):
+        return self.service.submit(self.session_id, fn, *args)
+
+    def try_submit(self, fn, *args):
+        return self.service.try_submit(self.session_id, fn, *args)
+
+    def cancel(self, future):
+        return self.service.cancel(self.session_id, future)